@@ -0,0 +1,82 @@
+import os
+import time
+import tempfile
+import asyncio
+import argparse
+import statistics
+import httpx
+from fixtures import BINANCE_FUTURES, BINANCE_SPOT, install_fixture_exchanges, load_fixtures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drive the pairlist app offline at a target RPS against recorded markets.")
+    parser.add_argument("fixtures", help="gzipped JSON written by `python fixtures.py record`")
+    parser.add_argument("--path", default="/spot_pairs_not_in_futures")
+    parser.add_argument("--rps", type=float, default=500)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--latency", type=float, default=0.3, help="mean upstream latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--cache-mode", default="swr", choices=["swr", "ttl"])
+    parser.add_argument("--soft-ttl", type=float, default=5)
+    parser.add_argument("--hard-ttl", type=float, default=60)
+    return parser.parse_args()
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+async def run(args):
+    fixtures = load_fixtures(args.fixtures)
+
+    # The service reads its configuration at import time
+    os.environ["PAIRLIST_CACHE_MODE"] = args.cache_mode
+    os.environ["PAIRLIST_CACHE_SOFT_TTL"] = str(args.soft_ttl)
+    os.environ["PAIRLIST_CACHE_HARD_TTL"] = str(args.hard_ttl)
+    os.environ["PAIRLIST_CACHE_BACKEND"] = "memory"
+    # Start cold from the fixtures and keep fixture data away from the live service's warm-start files
+    os.environ["PAIRLIST_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="pairlist-bench-")
+    os.environ["PAIRLIST_GAP_VENUES"] = ",".join(
+        name for name in fixtures if name not in (BINANCE_SPOT, BINANCE_FUTURES) and not name.endswith("_tickers"))
+    import main3
+
+    exchanges = install_fixture_exchanges(main3, fixtures, args.latency, args.failure_rate)
+    await main3.startup()
+
+    latencies = []
+    statuses = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main3.app), base_url="http://bench") as client:
+        async def request():
+            start = time.perf_counter()
+            try:
+                status = (await client.get(args.path)).status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        # Open-loop schedule: requests go out on time whether or not earlier ones have finished
+        total = int(args.rps * args.duration)
+        started = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            delay = started + i / args.rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(request()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    await main3.shutdown()
+
+    latencies.sort()
+    stats = main3.response_cache_stats
+    lookups = sum(stats.values()) or 1
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.0f} rps achieved, {args.rps:.0f} targeted)")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.2f} ms  p95 {percentile(latencies, 95) * 1000:.2f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms  mean {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"statuses {statuses}")
+    print(f"cache hit rate {(stats['hits'] + stats['stale_hits']) / lookups:.1%} {stats}")
+    print(f"upstream calls {sum(exchange.calls for exchange in exchanges)}, "
+          f"failures {sum(exchange.failures for exchange in exchanges)}")
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
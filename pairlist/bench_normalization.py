@@ -0,0 +1,60 @@
+import re
+import sys
+import time
+import ccxt
+from fixtures import BINANCE_FUTURES, BINANCE_SPOT, load_fixtures
+from main3 import build_market_index
+
+# Number of simulated refreshes per approach
+ROUNDS = 200
+
+def load_markets():
+    """Load the full Binance market lists, from a `python fixtures.py record` file if one is given."""
+    if len(sys.argv) > 1:
+        fixtures = load_fixtures(sys.argv[1])
+        return fixtures[BINANCE_SPOT], fixtures[BINANCE_FUTURES]
+
+    spot_markets = ccxt.binance().load_markets()
+    futures_markets = ccxt.binance({'options': {'defaultType': 'future'}}).load_markets()
+    return spot_markets, futures_markets
+
+def legacy_refresh(spot_markets, futures_markets):
+    # The per-market split/re.sub normalization the index replaced
+    spot_pairs = {market for market, data in spot_markets.items() if market.endswith('/USDT') and data['active']}
+    futures_pairs = set()
+    for market, data in futures_markets.items():
+        if market.endswith(':USDT') and data['active']:
+            base_symbol = market.split(':')[0]
+            if base_symbol not in spot_pairs:
+                base_symbol = re.sub(r'^\d+', '', base_symbol)
+            futures_pairs.add(base_symbol)
+    return sorted(spot_pairs - futures_pairs)
+
+def index_refresh(spot_markets, futures_markets):
+    index = build_market_index(spot_markets, futures_markets)
+    return sorted(index.spot_pairs.get('USDT', frozenset()) - index.futures_pairs.get('USDT', frozenset()))
+
+def timeit(label, fn, spot_markets, futures_markets):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn(spot_markets, futures_markets)
+    elapsed = (time.perf_counter() - start) / ROUNDS
+    print(f"{label:<8} {elapsed * 1000:8.3f} ms/refresh  ({len(result)} spot-only USDT pairs)")
+    return result
+
+if __name__ == "__main__":
+    spot_markets, futures_markets = load_markets()
+    print(f"{len(spot_markets)} spot markets, {len(futures_markets)} futures markets, {ROUNDS} rounds")
+
+    legacy = timeit("legacy", legacy_refresh, spot_markets, futures_markets)
+    indexed = timeit("index", index_refresh, spot_markets, futures_markets)
+
+    # Index lookups after the build are plain frozenset differences
+    index = build_market_index(spot_markets, futures_markets)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        sorted(index.spot_pairs.get('USDT', frozenset()) - index.futures_pairs.get('USDT', frozenset()))
+    print(f"{'lookup':<8} {(time.perf_counter() - start) / ROUNDS * 1000:8.3f} ms/request")
+
+    print(f"only in legacy: {sorted(set(legacy) - set(indexed))}")
+    print(f"only in index:  {sorted(set(indexed) - set(legacy))}")
@@ -0,0 +1,38 @@
+import sys
+import json
+import time
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fixtures import BINANCE_FUTURES, BINANCE_SPOT, load_fixtures
+from main3 import build_market_index
+
+# Simulated requests per measurement
+REQUESTS = 20000
+
+def load_pairs():
+    """Spot-only USDT pairs from a fixture file, or a synthetic list of realistic size."""
+    if len(sys.argv) > 1:
+        fixtures = load_fixtures(sys.argv[1])
+        index = build_market_index(fixtures[BINANCE_SPOT], fixtures[BINANCE_FUTURES])
+        return sorted(index.spot_pairs.get('USDT', frozenset()) - index.futures_pairs.get('USDT', frozenset()))
+    return [f"COIN{i}/USDT" for i in range(400)]
+
+def per_request(label, fn):
+    start = time.process_time()
+    for _ in range(REQUESTS):
+        fn()
+    elapsed = (time.process_time() - start) / REQUESTS
+    print(f"{label:<34} {elapsed * 1e6:9.2f} us CPU/request  ({1 / elapsed:,.0f} req/s per core)")
+
+if __name__ == "__main__":
+    pairs = load_pairs()
+    response = {"pairs": pairs, "version": 1, "refresh_period": 60.0}
+    print(f"{len(pairs)} pairs, {len(orjson.dumps(response))} byte body, {REQUESTS} requests")
+
+    # What FastAPI does with a returned dict: jsonable_encoder, then stdlib json in JSONResponse
+    per_request("dict -> jsonable_encoder + json", lambda: json.dumps(jsonable_encoder(response)).encode())
+    per_request("dict -> orjson per request", lambda: orjson.dumps(response))
+
+    # The pre-serialized path: bytes built once per refresh, handlers only hand them over
+    body = orjson.dumps(response)
+    per_request("pre-serialized bytes", lambda: body)
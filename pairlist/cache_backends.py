@@ -0,0 +1,176 @@
+import os
+import time
+import fcntl
+import socket
+import struct
+import tempfile
+from urllib.parse import quote, unquote
+from typing import Optional, Tuple
+from fastapi_cache.backends import Backend
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+# Identifies this worker as the holder of a refresh lease
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# ----------------------------
+# Shared-Memory File Backend
+# ----------------------------
+
+class FileBackend(Backend):
+    """Cache entries as files in a shared directory (tmpfs by default) so every worker on the host sees them."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, quote(key, safe=''))
+
+    def _read(self, key: str) -> Tuple[float, Optional[bytes]]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return 0.0, None
+
+        # Each file is an 8-byte expiry timestamp (0 for none) followed by the value
+        expires_at = struct.unpack('!d', raw[:8])[0]
+        if expires_at and expires_at < time.time():
+            return 0.0, None
+        return expires_at, raw[8:]
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        expires_at, value = self._read(key)
+        return (int(expires_at - time.time()) if expires_at else -1), value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._read(key)[1]
+
+    async def set(self, key: str, value, expire: Optional[int] = None):
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = time.time() + expire if expire else 0.0
+
+        # Write to a temporary file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('!d', expires_at))
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if key is not None:
+            names = [quote(key, safe='')]
+        else:
+            names = [name for name in os.listdir(self.directory)
+                     if not name.startswith('.tmp-') and (namespace is None or unquote(name).startswith(namespace))]
+
+        removed = 0
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+# ----------------------------
+# Refresh Leases
+# ----------------------------
+
+class LocalLease:
+    """Single-process lease that is always held."""
+    held = True
+
+    async def acquire(self) -> bool:
+        return True
+
+    async def release(self):
+        pass
+
+class FileLease:
+    """Host-wide lease held through an exclusive flock; the kernel releases it if the worker dies."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    async def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+# Renew the lease if we own it, otherwise take it only if nobody does
+ACQUIRE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class RedisLease:
+    """Cluster-wide lease stored as a Redis key that expires unless its holder keeps renewing it."""
+
+    def __init__(self, redis, key: str, ttl: float):
+        self.redis = redis
+        self.key = key
+        self.ttl = ttl
+        self.held = False
+
+    async def acquire(self) -> bool:
+        self.held = bool(await self.redis.eval(ACQUIRE_LEASE_SCRIPT, 1, self.key, WORKER_ID, int(self.ttl * 1000)))
+        return self.held
+
+    async def release(self):
+        if self.held:
+            await self.redis.eval(RELEASE_LEASE_SCRIPT, 1, self.key, WORKER_ID)
+            self.held = False
+
+# ----------------------------
+# Backend Selection
+# ----------------------------
+
+def create_cache_backend(kind: str, redis_url: str, cache_dir: str, lease_ttl: float):
+    """Return the (FastAPICache backend, refresh lease) pair for "memory", "redis" or "file"."""
+    if kind == "memory":
+        return InMemoryBackend(), LocalLease()
+
+    if kind == "redis":
+        from redis import asyncio as aioredis
+        from fastapi_cache.backends.redis import RedisBackend
+
+        redis = aioredis.from_url(redis_url)
+        return RedisBackend(redis), RedisLease(redis, "pairlist:refresh_lease", lease_ttl)
+
+    if kind == "file":
+        return FileBackend(cache_dir), FileLease(f"{cache_dir.rstrip('/')}.lock")
+
+    raise ValueError(f"Unknown cache backend '{kind}', expected memory, redis or file")
@@ -1,74 +1,1284 @@
-from fastapi import FastAPI, HTTPException
-import ccxt
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
+from fastapi.responses import Response, StreamingResponse
+import ccxt.async_support as ccxt_async
 import re
+import json
+import zlib
+import gzip
+import hashlib
+import os
+import time
+import asyncio
+import logging
+from contextlib import nullcontext
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Awaitable, Callable, Deque, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
-from fastapi_cache.decorator import cache
+from cache_backends import LocalLease, create_cache_backend
+from pair_table import PairTable, build_pair_table
+from upstream import CircuitOpenError, UpstreamGuard
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    Histogram = None
+
+def dumps(obj) -> bytes:
+    """Serialize to compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+def loads(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
 
 app = FastAPI()
+logger = logging.getLogger(__name__)
 
-# Initialize the ccxt Binance instances for spot and futures
-binance_spot = ccxt.binance()
-binance_futures = ccxt.binance({'options': {'defaultType': 'future'}})
-
-# List of pairs to attach to spot_not_in_futures
-additional_spot_pairs = {"1000PEPE/USDT", "XAI/USDT", "FET/USDT", "WIF/USDT", "1000SATS/USDT", "FRONT/USDT", "ZEC/USDT", "SOL/USDT", "TRU/USDT"}
-
-def get_binance_spot_pairs():
-    markets = binance_spot.load_markets()
-    # Filter for active pairs only and pairs ending with '/USDT'
-    return [market for market, data in markets.items() if market.endswith('/USDT') and data['active']]
-
-def normalize_futures_pair(pair: str, spot_pairs: set) -> str:
-    base_symbol = pair.split(':')[0]
-    
-    # If the direct comparison does not find a match, attempt normalization
-    if base_symbol not in spot_pairs:
-        # Remove numeric prefixes (like '1000')
-        base_symbol = re.sub(r'^\d+', '', base_symbol)
-    
-    return base_symbol
-
-def get_binance_futures_pairs(spot_pairs: set):
-    markets = binance_futures.load_markets()
-    # Normalize the futures pairs only if necessary and filter active pairs
-    normalized_markets = [
-        normalize_futures_pair(market, spot_pairs) for market, data in markets.items() if market.endswith(':USDT') and data['active']
-    ]
-    return normalized_markets
+# ccxt Binance instances for spot and futures, created once per process on startup
+binance_spot: Optional[ccxt_async.binance] = None
+binance_futures: Optional[ccxt_async.binance] = None
+# One client per additional venue; a single unified client loads both its spot and swap markets
+venue_clients: Dict[str, ccxt_async.Exchange] = {}
+# Rate limiter and circuit breaker per client, keyed "binance_spot", "binance_futures" or the venue id
+upstream_guards: Dict[str, UpstreamGuard] = {}
 
-@app.get("/spot_pairs_not_in_futures")
-@cache(expire=60)
-async def get_spot_pairs_not_in_futures():
-    spot_pairs = set(get_binance_spot_pairs())  # Convert to set for faster lookups
-    futures_pairs = set(get_binance_futures_pairs(spot_pairs))
+# JSON file with "include" and "exclude" pair lists applied on top of spot_not_in_futures, reloaded when it changes
+OVERRIDES_PATH = os.getenv("PAIRLIST_OVERRIDES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "overrides.json"))
+OVERRIDES_POLL_INTERVAL = float(os.getenv("PAIRLIST_OVERRIDES_POLL_INTERVAL", "2"))
+
+# Seconds between background market refreshes
+SNAPSHOT_REFRESH_INTERVAL = 60
+# How long a request may wait for the very first market load before it gets a 503
+SNAPSHOT_WAIT_TIMEOUT = 10
+
+# Response caching: "swr" serves stale entries while revalidating in the background, "ttl" recomputes on expiry
+CACHE_MODE = os.getenv("PAIRLIST_CACHE_MODE", "swr")
+# Entries older than the soft TTL are revalidated, entries older than the hard TTL are never served
+CACHE_SOFT_TTL = float(os.getenv("PAIRLIST_CACHE_SOFT_TTL", "60"))
+CACHE_HARD_TTL = float(os.getenv("PAIRLIST_CACHE_HARD_TTL", "1800"))
+# Other ccxt venues served by /pairs_gap next to Binance, and how long each may take to load its markets
+GAP_VENUES = [venue.strip().lower() for venue in os.getenv("PAIRLIST_GAP_VENUES", "okx,bybit,gate").split(",") if venue.strip()]
+VENUE_LOAD_TIMEOUT = float(os.getenv("PAIRLIST_VENUE_LOAD_TIMEOUT", "20"))
+
+# Cache backend shared by the workers: "memory" (per process), "redis" or "file" (tmpfs directory on one host)
+CACHE_BACKEND = os.getenv("PAIRLIST_CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("PAIRLIST_REDIS_URL", "redis://localhost:6379/0")
+CACHE_DIR = os.getenv("PAIRLIST_CACHE_DIR", "/dev/shm/pairlist")
+# Only the worker holding the refresh lease talks to the exchanges; it renews the lease on every refresh
+REFRESH_LEASE_TTL = float(os.getenv("PAIRLIST_REFRESH_LEASE_TTL", "150"))
+# Seconds between checks for a newer shared snapshot on workers that do not hold the lease
+SHARED_SNAPSHOT_POLL_INTERVAL = float(os.getenv("PAIRLIST_SHARED_SNAPSHOT_POLL_INTERVAL", "5"))
+# Quote assets warmed by /refresh_cache when none are given
+WARM_QUOTES = [quote.strip().upper() for quote in os.getenv("PAIRLIST_WARM_QUOTES", "USDT").split(",") if quote.strip()]
+# Number of per-refresh deltas kept for /spot_pairs_not_in_futures/changes
+CHANGE_FEED_HISTORY = 256
+# Pending push messages per subscriber before it is considered slow and resynced
+SUBSCRIBER_QUEUE_SIZE = 16
+# Seconds between SSE keepalive comments on idle streams
+SSE_KEEPALIVE_INTERVAL = 15
+# Directory for the last good snapshot of each venue, reloaded on startup for an instant warm start
+SNAPSHOT_DIR = os.getenv("PAIRLIST_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+
+# Request-weight budgets per minute; Binance reports actual usage in X-MBX-USED-WEIGHT-1M
+BINANCE_SPOT_WEIGHT_LIMIT = float(os.getenv("PAIRLIST_BINANCE_SPOT_WEIGHT_LIMIT", "6000"))
+BINANCE_FUTURES_WEIGHT_LIMIT = float(os.getenv("PAIRLIST_BINANCE_FUTURES_WEIGHT_LIMIT", "2400"))
+VENUE_WEIGHT_LIMIT = float(os.getenv("PAIRLIST_VENUE_WEIGHT_LIMIT", "600"))
+BINANCE_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+# Estimated weight of each upstream call; the weight header corrects the budget after every response
+LOAD_MARKETS_WEIGHT = 40
+FETCH_TICKERS_WEIGHT = 80
+# Consecutive failures that open a circuit, and seconds before a trial call is let through
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_TIMEOUT = 30
+# Set PAIRLIST_METRICS=0 to turn stage timing into no-ops and disable /metrics
+METRICS_ENABLED = os.getenv("PAIRLIST_METRICS", "1") == "1" and Histogram is not None
+
+# ----------------------------
+# Metrics
+# ----------------------------
+
+# Stages of building and serving the pair list timed by pairlist_stage_seconds
+STAGES = ("spot_load", "tickers_load", "futures_load", "normalization", "pair_table", "set_diff", "serialization", "cache_lookup")
+
+if METRICS_ENABLED:
+    METRICS_REGISTRY = CollectorRegistry()
+    STAGE_SECONDS = Histogram(
+        "pairlist_stage_seconds", "Time spent in each stage of building and serving the pair list", ["stage"],
+        buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+        registry=METRICS_REGISTRY,
+    )
+    # Resolve the labelled children once so timing a stage is a dict lookup plus two clock reads
+    _stage_histograms = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+
+    def timed(stage: str):
+        return _stage_histograms[stage].time()
+else:
+    _no_timer = nullcontext()
+
+    def timed(stage: str):
+        return _no_timer
+
+class PairlistCollector:
+    """Read the service's existing counters at scrape time so the hot path pays nothing for them."""
+
+    def collect(self):
+        responses = CounterMetricFamily("pairlist_response_cache", "Pair list cache lookups by outcome", labels=["outcome"])
+        for outcome, count in response_cache_stats.items():
+            responses.add_metric([outcome], count)
+        yield responses
+
+        flights = single_flight.stats()
+        yield CounterMetricFamily("pairlist_single_flight_calls", "Computations started by the single-flight layer", value=flights["calls"])
+        yield CounterMetricFamily("pairlist_single_flight_coalesced", "Callers that shared an in-flight computation", value=flights["coalesced"])
+
+        calls = CounterMetricFamily("pairlist_upstream_calls", "Exchange calls made", labels=["client"])
+        errors = CounterMetricFamily("pairlist_upstream_errors", "Exchange calls that failed", labels=["client"])
+        rejected = CounterMetricFamily("pairlist_upstream_rejected", "Exchange calls refused by an open circuit", labels=["client"])
+        weight = GaugeMetricFamily("pairlist_upstream_used_weight", "Request weight the exchange reports as used this minute", labels=["client"])
+        circuit = GaugeMetricFamily("pairlist_upstream_circuit_open", "1 while the client's circuit is open", labels=["client"])
+        for name, guard in upstream_guards.items():
+            stats = guard.stats()
+            calls.add_metric([name], stats["calls"])
+            errors.add_metric([name], stats["errors"])
+            rejected.add_metric([name], stats["rejected"])
+            if stats["used_weight"] is not None:
+                weight.add_metric([name], stats["used_weight"])
+            circuit.add_metric([name], 1 if stats["circuit"] == "open" else 0)
+        yield from (calls, errors, rejected, weight, circuit)
+
+        age = GaugeMetricFamily("pairlist_snapshot_age_seconds", "Age of the market snapshot being served", labels=["venue"])
+        version = GaugeMetricFamily("pairlist_snapshot_version", "Version of the market snapshot being served", labels=["venue"])
+        snapshots = {"binance": _snapshot, **_venue_snapshots}
+        for venue, snapshot in snapshots.items():
+            if snapshot is not None:
+                age.add_metric([venue], snapshot.age)
+                version.add_metric([venue], snapshot.version)
+        yield from (age, version)
+
+        subscribers = GaugeMetricFamily("pairlist_push_subscribers", "Connected SSE and WebSocket subscribers", labels=["quote"])
+        for quote, count in broadcaster.stats().items():
+            subscribers.add_metric([quote], count)
+        yield subscribers
+
+if METRICS_ENABLED:
+    METRICS_REGISTRY.register(PairlistCollector())
+
+# ----------------------------
+# Exchange Clients
+# ----------------------------
+
+def open_exchanges():
+    """Create the async exchange clients if this process does not have them yet."""
+    global binance_spot, binance_futures
+    if binance_spot is None:
+        binance_spot = ccxt_async.binance({'enableRateLimit': True})
+    if binance_futures is None:
+        binance_futures = ccxt_async.binance({'enableRateLimit': True, 'options': {'defaultType': 'future'}})
+    for venue in GAP_VENUES:
+        if venue not in venue_clients:
+            venue_clients[venue] = getattr(ccxt_async, venue)({'enableRateLimit': True})
+
+    clients = {"binance_spot": (binance_spot, BINANCE_SPOT_WEIGHT_LIMIT, BINANCE_WEIGHT_HEADER),
+               "binance_futures": (binance_futures, BINANCE_FUTURES_WEIGHT_LIMIT, BINANCE_WEIGHT_HEADER)}
+    for venue, client in venue_clients.items():
+        clients[venue] = (client, VENUE_WEIGHT_LIMIT, None)
+    for name, (client, weight_limit, weight_header) in clients.items():
+        guard = upstream_guards.get(name)
+        if guard is None or guard.client is not client:
+            upstream_guards[name] = UpstreamGuard(name, client, weight_limit, weight_header,
+                                                  CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+async def close_exchanges():
+    """Close the underlying HTTP sessions of the exchange clients."""
+    global binance_spot, binance_futures
+    clients = [client for client in (binance_spot, binance_futures, *venue_clients.values()) if client is not None]
+    binance_spot = binance_futures = None
+    venue_clients.clear()
+    upstream_guards.clear()
+    await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+def slim_ticker(ticker: dict) -> dict:
+    return {"last": ticker.get("last"), "bid": ticker.get("bid"), "ask": ticker.get("ask"), "quoteVolume": ticker.get("quoteVolume")}
+
+async def load_spot_markets():
+    with timed("spot_load"):
+        return await upstream_guards["binance_spot"].call(lambda: binance_spot.load_markets(True), LOAD_MARKETS_WEIGHT)
+
+async def load_spot_tickers():
+    try:
+        # One batched call covers every spot symbol
+        with timed("tickers_load"):
+            tickers = await upstream_guards["binance_spot"].call(binance_spot.fetch_tickers, FETCH_TICKERS_WEIGHT)
+    except Exception as e:
+        logger.warning(f"Spot ticker fetch failed, keeping the previous tickers: {e}")
+        return None
+    return {symbol: slim_ticker(ticker) for symbol, ticker in tickers.items()}
+
+async def load_spot_markets_and_tickers():
+    # ccxt resolves ticker symbols through the loaded markets, so the very first ticker fetch has to wait for them
+    markets = await load_spot_markets()
+    return markets, await load_spot_tickers()
+
+async def load_futures_markets():
+    with timed("futures_load"):
+        return await upstream_guards["binance_futures"].call(lambda: binance_futures.load_markets(True), LOAD_MARKETS_WEIGHT)
+
+async def load_all_markets():
+    """Load spot markets, their tickers and futures markets concurrently, bounded by the slowest call."""
+    open_exchanges()
+    if not binance_spot.markets:
+        (spot_markets, tickers), futures_markets = await asyncio.gather(
+            load_spot_markets_and_tickers(),
+            load_futures_markets(),
+        )
+        return spot_markets, futures_markets, tickers
+
+    # After the first load the client already knows every symbol, so tickers need not wait for the market reload
+    spot_markets, futures_markets, tickers = await asyncio.gather(
+        load_spot_markets(),
+        load_futures_markets(),
+        load_spot_tickers(),
+    )
+    return spot_markets, futures_markets, tickers
+
+# ----------------------------
+# Single-Flight Coalescing
+# ----------------------------
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        # Shield so a disconnecting caller does not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def is_inflight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+single_flight = SingleFlight()
+
+# ----------------------------
+# Market Index
+# ----------------------------
+
+# Futures bases quoted per N units, e.g. 1000PEPE, 1000000MOG or 1MBABYDOGE
+MULTIPLIER_BASE = re.compile(r'^(\d+)([A-Z].*)$')
+
+@dataclass(frozen=True)
+class MarketIndex:
+    """Per-quote pair sets and the futures-to-spot symbol mapping, built once per snapshot."""
+    spot_pairs: Mapping[str, FrozenSet[str]]
+    futures_pairs: Mapping[str, FrozenSet[str]]
+    futures_to_spot: Mapping[str, str]
+    # Base units of the spot asset per futures contract, from the symbol prefix and contractSize
+    multipliers: Mapping[str, float]
+
+def spot_symbol_for(data: dict, spot_pairs: FrozenSet[str]):
+    """Map a linear futures market onto its spot symbol and contract multiplier."""
+    base, quote = data['base'], data['quote']
+    multiplier = float(data.get('contractSize') or 1)
+    symbol = f"{base}/{quote}"
+    if symbol in spot_pairs:
+        return symbol, multiplier
+
+    match = MULTIPLIER_BASE.match(base)
+    if not match:
+        return symbol, multiplier
 
-    spot_not_in_futures = sorted(list((spot_pairs - futures_pairs) | additional_spot_pairs))
+    # A leading M is either a "millions" suffix on the count (1MBABYDOGE) or part of the base (1000000MOG,
+    # 1000MEW), so only strip it when that is the candidate actually listed on spot
+    digits, base = match.groups()
+    if base.startswith('M') and len(base) > 1 and f"{base}/{quote}" not in spot_pairs \
+            and f"{base[1:]}/{quote}" in spot_pairs:
+        return f"{base[1:]}/{quote}", multiplier * int(digits) * 1_000_000
+    return f"{base}/{quote}", multiplier * int(digits)
 
+def build_market_index(spot_markets: Mapping[str, dict], futures_markets: Mapping[str, dict]) -> MarketIndex:
+    spot_by_quote = defaultdict(set)
+    for symbol, data in spot_markets.items():
+        if data['active'] and data.get('spot'):
+            spot_by_quote[data['quote']].add(symbol)
+    spot_pairs = {quote: frozenset(symbols) for quote, symbols in spot_by_quote.items()}
+
+    futures_by_quote = defaultdict(set)
+    futures_to_spot = {}
+    multipliers = {}
+    for symbol, data in futures_markets.items():
+        # Only active linear perpetuals settled in their quote asset, e.g. BTC/USDT:USDT
+        if not (data['active'] and data.get('swap') and data.get('settle') == data['quote']):
+            continue
+        quote = data['quote']
+        spot_symbol, multiplier = spot_symbol_for(data, spot_pairs.get(quote, frozenset()))
+        futures_by_quote[quote].add(spot_symbol)
+        futures_to_spot[symbol] = spot_symbol
+        multipliers[symbol] = multiplier
+
+    return MarketIndex(
+        spot_pairs=MappingProxyType(spot_pairs),
+        futures_pairs=MappingProxyType({quote: frozenset(symbols) for quote, symbols in futures_by_quote.items()}),
+        futures_to_spot=MappingProxyType(futures_to_spot),
+        multipliers=MappingProxyType(multipliers),
+    )
+
+# ----------------------------
+# Market Snapshot
+# ----------------------------
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Immutable view of the spot and futures markets taken at one point in time."""
+    version: int
+    fetched_at: float
+    spot_markets: Mapping[str, dict]
+    futures_markets: Mapping[str, dict]
+    index: MarketIndex
+    table: PairTable
+    # Last, bid, ask and 24h quote volume per spot symbol from the refresh's batched fetch_tickers
+    tickers: Mapping[str, dict]
+    # Loaded from disk at startup rather than fetched by this run of the service
+    restored: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+def make_snapshot(version: int, fetched_at: float, spot_markets: Mapping[str, dict], futures_markets: Optional[Mapping[str, dict]],
+                  tickers: Optional[Mapping[str, dict]] = None, restored: bool = False) -> MarketSnapshot:
+    """Freeze loaded markets into a snapshot; venues with one unified market list pass futures_markets=None."""
+    spot_markets = MappingProxyType(dict(spot_markets))
+    futures_markets = spot_markets if futures_markets is None else MappingProxyType(dict(futures_markets))
+    with timed("normalization"):
+        index = build_market_index(spot_markets, futures_markets)
+    tickers = MappingProxyType(dict(tickers or {}))
+    with timed("pair_table"):
+        table = build_pair_table(spot_markets, index.futures_pairs, tickers)
+    return MarketSnapshot(
+        version=version,
+        fetched_at=fetched_at,
+        spot_markets=spot_markets,
+        futures_markets=futures_markets,
+        index=index,
+        table=table,
+        tickers=tickers,
+        restored=restored,
+    )
+
+_snapshot: Optional[MarketSnapshot] = None
+_snapshot_ready = asyncio.Event()
+_service_tasks: List[asyncio.Task] = []
+# Replaced on startup by the lease matching the configured cache backend
+refresh_lease = LocalLease()
+
+def install_snapshot(snapshot: MarketSnapshot):
+    global _snapshot
+    # Rebinding the module global is atomic, readers see either the old or the new snapshot
+    _snapshot = snapshot
+    precompute_profiles(snapshot)
+    _snapshot_ready.set()
+    publish_changes(snapshot)
+
+async def _load_snapshot() -> MarketSnapshot:
+    spot_markets, futures_markets, tickers = await load_all_markets()
+    if tickers is None:
+        tickers = _snapshot.tickers if _snapshot else {}
+
+    # Continue the shared version sequence when this worker has just taken over the lease
+    version = max(_snapshot.version if _snapshot else 0, await read_shared_version("binance")) + 1
+    snapshot = make_snapshot(version, time.time(), spot_markets, futures_markets, tickers)
+    install_snapshot(snapshot)
+    await publish_shared_snapshot("binance", snapshot)
+    persist_snapshot_in_background("binance", snapshot)
+    logger.info(f"Market snapshot v{version} loaded ({len(spot_markets)} spot, {len(futures_markets)} futures).")
+    return snapshot
+
+async def _sync_snapshot() -> Optional[MarketSnapshot]:
+    snapshot = await read_shared_snapshot("binance", _snapshot)
+    if snapshot is not None and snapshot is not _snapshot:
+        install_snapshot(snapshot)
+        logger.info(f"Market snapshot v{snapshot.version} synced from the shared cache.")
+    return _snapshot
+
+async def _refresh_or_sync() -> Optional[MarketSnapshot]:
+    if await refresh_lease.acquire():
+        try:
+            return await _load_snapshot()
+        except CircuitOpenError as e:
+            # Exchange is backing us off; keep serving the last good snapshot
+            if _snapshot is None:
+                raise
+            logger.warning(f"Serving snapshot v{_snapshot.version} while the Binance circuit is open: {e}")
+            return _snapshot
+    return await _sync_snapshot()
+
+async def refresh_snapshot() -> Optional[MarketSnapshot]:
+    """Reload the markets, or pick up the lease holder's snapshot, sharing any refresh already running."""
+    return await single_flight.do("markets", _refresh_or_sync)
+
+async def snapshot_refresher():
+    """Keep the market snapshot fresh for the lifetime of the app."""
+    while True:
+        try:
+            await refresh_snapshot()
+        except Exception as e:
+            # Keep serving the last good snapshot until the next attempt
+            logger.error(f"Market snapshot refresh failed: {e}")
+        await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL if refresh_lease.held else SHARED_SNAPSHOT_POLL_INTERVAL)
+
+async def get_snapshot() -> MarketSnapshot:
+    """Return the current snapshot, waiting a bounded time only for the very first load."""
+    if _snapshot is None:
+        try:
+            await asyncio.wait_for(_snapshot_ready.wait(), SNAPSHOT_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Markets are not loaded yet")
+    return _snapshot
+
+# ----------------------------
+# Shared Snapshots
+# ----------------------------
+
+def shared_markets_key(name: str) -> str:
+    return f"pairlist:markets:{name}"
+
+def shared_version_key(name: str) -> str:
+    return f"pairlist:markets_version:{name}"
+
+def snapshot_payload(snapshot: MarketSnapshot) -> dict:
+    """Plain-dict form of a snapshot shared by the cross-worker cache and the on-disk copy."""
+    futures_markets = None if snapshot.futures_markets is snapshot.spot_markets else dict(snapshot.futures_markets)
     return {
-        "pairs": spot_not_in_futures,
-        "refresh_period": 1800  # Refresh period in seconds (e.g., 1800 seconds = 30 minutes)
+        "version": snapshot.version,
+        "fetched_at": snapshot.fetched_at,
+        "spot": dict(snapshot.spot_markets),
+        "futures": futures_markets,
+        "tickers": dict(snapshot.tickers),
     }
 
-@app.get("/refresh_cache")
-async def refresh_cache():
-    # Clear the entire cache
-    await FastAPICache.clear()
+def snapshot_from_payload(payload: dict, restored: bool = False) -> MarketSnapshot:
+    return make_snapshot(payload["version"], payload["fetched_at"], payload["spot"], payload["futures"],
+                         payload.get("tickers"), restored=restored)
 
-    spot_pairs = set(get_binance_spot_pairs())  # Convert to set for faster lookups
-    futures_pairs = set(get_binance_futures_pairs(spot_pairs))
+def encode_snapshot(snapshot: MarketSnapshot) -> bytes:
+    return zlib.compress(dumps(snapshot_payload(snapshot)), 1)
 
-    spot_not_in_futures = sorted(list((spot_pairs - futures_pairs) | additional_spot_pairs))
+def decode_snapshot(raw: bytes) -> MarketSnapshot:
+    return snapshot_from_payload(loads(zlib.decompress(raw)))
 
-    # Manually cache the refreshed result using the cache backend
+async def publish_shared_snapshot(name: str, snapshot: MarketSnapshot):
+    """Hand a freshly loaded snapshot to the other workers through the shared cache backend."""
+    if CACHE_BACKEND == "memory":
+        return
     backend = FastAPICache.get_backend()
-    await backend.set("spot_not_in_futures", spot_not_in_futures, expire=1800)
+    raw = await asyncio.to_thread(encode_snapshot, snapshot)
+    # Write the payload before the version so a reader never sees a version without its markets
+    await backend.set(shared_markets_key(name), raw, expire=int(CACHE_HARD_TTL))
+    await backend.set(shared_version_key(name), str(snapshot.version).encode(), expire=int(CACHE_HARD_TTL))
+
+async def read_shared_version(name: str) -> int:
+    if CACHE_BACKEND == "memory":
+        return 0
+    raw = await FastAPICache.get_backend().get(shared_version_key(name))
+    return int(raw) if raw is not None else 0
+
+async def read_shared_snapshot(name: str, current: Optional[MarketSnapshot]) -> Optional[MarketSnapshot]:
+    """Return the shared snapshot if it is newer than current, otherwise current."""
+    version = await read_shared_version(name)
+    if version == 0 or (current is not None and version <= current.version):
+        return current
+    raw = await FastAPICache.get_backend().get(shared_markets_key(name))
+    if raw is None:
+        return current
+    return await asyncio.to_thread(decode_snapshot, raw)
+
+# ----------------------------
+# Snapshot Persistence
+# ----------------------------
+
+def snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.msgpack" if msgpack is not None else f"{name}.json.zlib")
+
+def write_snapshot_file(name: str, snapshot: MarketSnapshot):
+    if msgpack is not None:
+        raw = msgpack.packb(snapshot_payload(snapshot), use_bin_type=True, default=str)
+    else:
+        raw = encode_snapshot(snapshot)
+
+    # Write then rename so a crash mid-write never leaves a truncated snapshot behind
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+
+def read_snapshot_file(name: str) -> Optional[MarketSnapshot]:
+    try:
+        with open(snapshot_path(name), 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+
+    if msgpack is not None:
+        payload = msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    else:
+        payload = loads(zlib.decompress(raw))
+    return snapshot_from_payload(payload, restored=True)
+
+def _persist_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Persisting market snapshot failed: {task.exception()}")
+
+def persist_snapshot_in_background(name: str, snapshot: MarketSnapshot):
+    task = asyncio.create_task(asyncio.to_thread(write_snapshot_file, name, snapshot))
+    _background_tasks.add(task)
+    task.add_done_callback(_persist_done)
+
+def restore_snapshots():
+    """Serve the last good snapshots from disk, marked stale, until the first fetch replaces them."""
+    for name in ["binance", *GAP_VENUES]:
+        try:
+            snapshot = read_snapshot_file(name)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {name} snapshot file: {e}")
+            continue
+        if snapshot is None:
+            continue
+
+        if name == "binance":
+            install_snapshot(snapshot)
+        else:
+            _venue_snapshots[name] = snapshot
+        logger.info(f"Restored {name} snapshot v{snapshot.version} from disk ({snapshot.age:.0f}s old).")
+
+# ----------------------------
+# Venue Snapshots
+# ----------------------------
+
+_venue_snapshots: Dict[str, MarketSnapshot] = {}
+# Serialized /pairs_gap bodies keyed by (spot venue, futures venue, quote), with the snapshots they came from
+_gap_bodies: Dict[Tuple[str, str, str], Tuple[MarketSnapshot, MarketSnapshot, bytes]] = {}
+
+async def refresh_venue(venue: str) -> MarketSnapshot:
+    """Reload one venue's markets and swap in its own snapshot."""
+    client = venue_clients[venue]
+    markets = await upstream_guards[venue].call(
+        lambda: asyncio.wait_for(client.load_markets(True), VENUE_LOAD_TIMEOUT), LOAD_MARKETS_WEIGHT)
+    previous = _venue_snapshots.get(venue)
+    version = max(previous.version if previous else 0, await read_shared_version(venue)) + 1
+    snapshot = make_snapshot(version, time.time(), markets, None)
+    _venue_snapshots[venue] = snapshot
+    await publish_shared_snapshot(venue, snapshot)
+    persist_snapshot_in_background(venue, snapshot)
+    return snapshot
+
+async def sync_venue(venue: str) -> Optional[MarketSnapshot]:
+    snapshot = await read_shared_snapshot(venue, _venue_snapshots.get(venue))
+    if snapshot is not None:
+        _venue_snapshots[venue] = snapshot
+    return snapshot
+
+async def venue_refresher():
+    """Refresh every additional venue concurrently; a slow or failing venue only delays itself."""
+    while True:
+        venues = list(venue_clients)
+        try:
+            leader = await refresh_lease.acquire()
+        except Exception as e:
+            logger.error(f"Refresh lease check failed: {e}")
+            leader = False
+        refresh = refresh_venue if leader else sync_venue
+
+        results = await asyncio.gather(*(refresh(venue) for venue in venues), return_exceptions=True)
+        for venue, result in zip(venues, results):
+            if isinstance(result, BaseException):
+                logger.error(f"{venue} market refresh failed: {result!r}")
+        await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL if leader else SHARED_SNAPSHOT_POLL_INTERVAL)
+
+def venue_snapshot(venue: str) -> MarketSnapshot:
+    """Return the in-memory snapshot for a venue without waiting on the exchange."""
+    venue = venue.lower()
+    if venue == "binance":
+        snapshot = _snapshot
+    elif venue in GAP_VENUES:
+        snapshot = _venue_snapshots.get(venue)
+    else:
+        raise HTTPException(status_code=404, detail=f"Unknown venue {venue}")
+
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail=f"Markets for {venue} are not loaded yet")
+    return snapshot
+
+# ----------------------------
+# Pair Computation
+# ----------------------------
+
+def get_binance_spot_pairs(snapshot: MarketSnapshot, quote: str = "USDT") -> FrozenSet[str]:
+    return snapshot.index.spot_pairs.get(quote, frozenset())
+
+def get_binance_futures_pairs(snapshot: MarketSnapshot, quote: str = "USDT") -> FrozenSet[str]:
+    # Already normalized to spot symbols by the market index
+    return snapshot.index.futures_pairs.get(quote, frozenset())
+
+def ticker_summary(ticker: Optional[dict]) -> Optional[dict]:
+    if not ticker:
+        return None
+    bid, ask = ticker.get("bid"), ticker.get("ask")
+    spread_bps = (ask - bid) / ((ask + bid) / 2) * 10_000 if bid and ask else None
+    return {
+        "last": ticker.get("last"),
+        "quote_volume": ticker.get("quoteVolume"),
+        "spread_bps": round(spread_bps, 2) if spread_bps is not None else None,
+    }
+
+def compute_spot_not_in_futures(snapshot: MarketSnapshot, quote: str = "USDT",
+                                include: FrozenSet[str] = frozenset(), exclude: FrozenSet[str] = frozenset()):
+    """Spot pairs without a perp, with the global overrides plus any extra include/exclude lists applied."""
+    spot_pairs = get_binance_spot_pairs(snapshot, quote)
+    futures_pairs = get_binance_futures_pairs(snapshot, quote)
+    overrides = pair_overrides
+    include = {pair for pair in overrides.include | include if pair.endswith(f"/{quote}")}
 
-    return {"status": "Cache refreshed"}
+    with timed("set_diff"):
+        return sorted(((spot_pairs - futures_pairs) | include) - overrides.exclude - exclude)
+
+# ----------------------------
+# Pair Overrides
+# ----------------------------
+
+@dataclass(frozen=True)
+class PairProfile:
+    """A bot fleet's view of the pair list: its quote asset and its own overrides on top of the global ones."""
+    quote: str = "USDT"
+    include: FrozenSet[str] = frozenset()
+    exclude: FrozenSet[str] = frozenset()
+
+@dataclass(frozen=True)
+class PairOverrides:
+    include: FrozenSet[str] = frozenset()
+    exclude: FrozenSet[str] = frozenset()
+    profiles: Mapping[str, PairProfile] = field(default_factory=lambda: MappingProxyType({}))
+    # Hash of the file contents, identical on every worker reading the same file
+    revision: str = "none"
+
+pair_overrides = PairOverrides()
+_overrides_mtime: Optional[int] = None
+
+def read_overrides(path: str) -> PairOverrides:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = loads(raw)
+    profiles = {
+        name: PairProfile(
+            quote=profile.get("quote", "USDT").upper(),
+            include=frozenset(profile.get("include", [])),
+            exclude=frozenset(profile.get("exclude", [])),
+        )
+        for name, profile in data.get("profiles", {}).items()
+    }
+    return PairOverrides(
+        include=frozenset(data.get("include", [])),
+        exclude=frozenset(data.get("exclude", [])),
+        profiles=MappingProxyType(profiles),
+        revision=hashlib.sha1(raw).hexdigest()[:12],
+    )
+
+def load_overrides_if_changed() -> bool:
+    """Re-read the overrides file if its mtime moved; returns True when the overrides changed."""
+    global pair_overrides, _overrides_mtime
+    try:
+        mtime = os.stat(OVERRIDES_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime == _overrides_mtime:
+        return False
+
+    overrides = read_overrides(OVERRIDES_PATH) if mtime is not None else PairOverrides()
+    _overrides_mtime = mtime
+    if overrides == pair_overrides:
+        return False
+    pair_overrides = overrides
+    logger.info(f"Pair overrides {overrides.revision} loaded ({len(overrides.include)} included, {len(overrides.exclude)} excluded).")
+    return True
+
+async def apply_overrides():
+    """Re-derive feeds and cached responses from the current snapshot; no exchange calls, no cache flush."""
+    if _snapshot is None:
+        return
+    publish_changes(_snapshot)
+    precompute_profiles(_snapshot)
+    quotes = set(WARM_QUOTES) | {key.rsplit(":", 1)[1] for key in _encoded_pairs}
+    await warm_pairs_cache(_snapshot, sorted(quotes))
+
+async def overrides_watcher():
+    while True:
+        await asyncio.sleep(OVERRIDES_POLL_INTERVAL)
+        try:
+            if load_overrides_if_changed():
+                await apply_overrides()
+        except Exception as e:
+            # Keep the last good overrides until the file is fixed
+            logger.error(f"Reloading pair overrides failed: {e}")
+
+# ----------------------------
+# Change Feed
+# ----------------------------
+
+# Snapshot versions are only shared between workers through a shared backend; with "memory" every worker
+# counts its own, so tokens carry a per-process epoch that never matches another worker's
+FEED_EPOCH = os.urandom(4).hex() if CACHE_BACKEND == "memory" else None
+
+def feed_token(snapshot: MarketSnapshot) -> str:
+    """Feed version for a snapshot and the current overrides; a token means the same pair set on every worker."""
+    token = f"{snapshot.version}.{pair_overrides.revision}"
+    return f"{FEED_EPOCH}.{token}" if FEED_EPOCH is not None else token
+
+class PairChangeFeed:
+    """Track the pair set and keep the added/removed delta of each snapshot refresh or override reload."""
+
+    def __init__(self, history: int = CHANGE_FEED_HISTORY):
+        self.version = ""
+        self.pairs: FrozenSet[str] = frozenset()
+        # (version, added, removed) for every version this worker has served, including unchanged ones
+        self._deltas: Deque[Tuple[str, FrozenSet[str], FrozenSet[str]]] = deque(maxlen=history)
+
+    def update(self, pairs: Iterable[str], version: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        pairs = frozenset(pairs)
+        added = pairs - self.pairs
+        removed = self.pairs - pairs
+        if version != self.version:
+            self._deltas.append((version, added, removed))
+            self.version = version
+        self.pairs = pairs
+        return added, removed
+
+    def changes_since(self, since: str) -> dict:
+        # A version this worker never served, or one evicted from the history, can only be answered with a reset
+        start = next((i for i in range(len(self._deltas) - 1, -1, -1) if self._deltas[i][0] == since), None)
+        if start is None:
+            return {"version": self.version, "since": since, "reset": True, "pairs": sorted(self.pairs)}
+
+        added, removed = set(), set()
+        for _, delta_added, delta_removed in list(self._deltas)[start + 1:]:
+            for pair in delta_added:
+                if pair in removed:
+                    removed.discard(pair)
+                else:
+                    added.add(pair)
+            for pair in delta_removed:
+                if pair in added:
+                    added.discard(pair)
+                else:
+                    removed.add(pair)
+
+        return {"version": self.version, "since": since, "reset": False, "added": sorted(added), "removed": sorted(removed)}
+
+change_feeds: Dict[str, PairChangeFeed] = {quote: PairChangeFeed() for quote in WARM_QUOTES}
+
+def publish_changes(snapshot: MarketSnapshot):
+    version = feed_token(snapshot)
+    for quote, feed in change_feeds.items():
+        added, removed = feed.update(compute_spot_not_in_futures(snapshot, quote), version)
+        if added or removed:
+            broadcaster.publish(quote, feed, added, removed)
+
+# ----------------------------
+# Push Subscribers
+# ----------------------------
+
+# A queued push message: (event name, feed version, JSON payload)
+PushMessage = Tuple[str, str, str]
+
+def reset_message(feed: PairChangeFeed) -> PushMessage:
+    payload = {"event": "reset", "version": feed.version, "pairs": sorted(feed.pairs)}
+    return "reset", feed.version, dumps(payload).decode()
+
+class Subscriber:
+    def __init__(self, quote: str, queue_size: int):
+        self.quote = quote
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+class PairBroadcaster:
+    """Fan pair-set deltas out to SSE and WebSocket subscribers without letting slow ones block the rest."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+
+    def subscribe(self, quote: str, feed: PairChangeFeed) -> Subscriber:
+        subscriber = Subscriber(quote, self.queue_size)
+        # Every subscriber starts from the full current set
+        subscriber.queue.put_nowait(reset_message(feed))
+        self._subscribers.setdefault(quote, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.quote)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+
+    def publish(self, quote: str, feed: PairChangeFeed, added: FrozenSet[str], removed: FrozenSet[str]):
+        subscribers = self._subscribers.get(quote)
+        if not subscribers:
+            return
+
+        # Encode once per refresh, not once per subscriber
+        payload = {"event": "delta", "version": feed.version, "added": sorted(added), "removed": sorted(removed)}
+        message = ("delta", feed.version, dumps(payload).decode())
+        resync = None
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and let it resync from the full set
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                if resync is None:
+                    resync = reset_message(feed)
+                subscriber.queue.put_nowait(resync)
+                subscriber.resyncs += 1
+
+    def stats(self) -> dict:
+        return {quote: len(subscribers) for quote, subscribers in self._subscribers.items()}
+
+broadcaster = PairBroadcaster()
+
+def get_change_feed(quote: str) -> PairChangeFeed:
+    feed = change_feeds.get(quote.upper())
+    if feed is None:
+        raise HTTPException(status_code=404, detail=f"No change feed for quote {quote}")
+    return feed
+
+# ----------------------------
+# Response Cache
+# ----------------------------
+
+_background_tasks = set()
+# Outcomes of /spot_pairs_not_in_futures cache lookups
+response_cache_stats = {"hits": 0, "stale_hits": 0, "misses": 0}
+
+@dataclass(frozen=True)
+class EncodedPairs:
+    """A cached pair list serialized and compressed once, ready to be sent as-is."""
+    # Unquoted base of the ETag; each content-coding appends its own suffix
+    etag: str
+    version: int
+    computed_at: float
+    # Computed from a snapshot restored from disk that has not been refreshed yet
+    restored: bool
+    overrides: str
+    # Response body per content-coding: "identity", "gzip" and, if brotli is installed, "br"
+    bodies: Mapping[str, bytes]
+
+# Per-worker memo of the last raw cache entry seen for each key and its encoded bodies
+_encoded_pairs: Dict[str, Tuple[bytes, EncodedPairs]] = {}
+
+def pairs_cache_key(quote: str = "USDT") -> str:
+    return f"{FastAPICache.get_prefix()}:spot_pairs_not_in_futures:{quote}"
+
+def encode_pairs(tag: str, entry: dict) -> EncodedPairs:
+    """Serialize and compress an entry; tag (the quote or profile name) keeps ETags distinct across variants."""
+    body = dumps({
+        "pairs": entry["pairs"],
+        "tickers": entry.get("tickers", {}),
+        "version": entry["version"],
+        "refresh_period": CACHE_SOFT_TTL,  # Seconds until consumers should poll again
+    })
+
+    bodies = {"identity": body, "gzip": gzip.compress(body, 6)}
+    if brotli is not None:
+        # Quality 11 (the default) is far too slow to run on the event loop for every entry and profile
+        bodies["br"] = brotli.compress(body, quality=5)
+
+    return EncodedPairs(
+        # Versions are per worker with the memory backend, so only the body itself identifies the representation
+        etag=f"{tag}-{hashlib.blake2b(body, digest_size=8).hexdigest()}",
+        version=entry["version"],
+        computed_at=entry["computed_at"],
+        restored=entry.get("restored", False),
+        overrides=entry.get("overrides", "none"),
+        bodies=MappingProxyType(bodies),
+    )
+
+def remember_encoded(key: str, quote: str, raw: bytes, entry: Optional[dict] = None) -> EncodedPairs:
+    with timed("serialization"):
+        encoded = encode_pairs(quote, entry if entry is not None else loads(raw))
+    _encoded_pairs[key] = (raw, encoded)
+    return encoded
+
+async def read_cached_pairs(key: str, quote: str) -> Optional[EncodedPairs]:
+    with timed("cache_lookup"):
+        raw = await FastAPICache.get_backend().get(key)
+    if raw is None:
+        return None
+
+    # Only decode and re-encode when the stored entry actually changed
+    cached = _encoded_pairs.get(key)
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+    return remember_encoded(key, quote, raw)
+
+def build_entry(snapshot: MarketSnapshot, pairs: List[str]) -> dict:
+    return {
+        "pairs": pairs,
+        # Saves consumers a follow-up ticker call per pair
+        "tickers": {pair: ticker_summary(snapshot.tickers.get(pair)) for pair in pairs},
+        "version": snapshot.version,
+        "computed_at": time.time(),
+        "restored": snapshot.restored,
+        "overrides": pair_overrides.revision,
+    }
+
+async def store_pairs(key: str, quote: str, snapshot: MarketSnapshot) -> EncodedPairs:
+    entry = build_entry(snapshot, compute_spot_not_in_futures(snapshot, quote))
+    raw = dumps(entry)
+    await FastAPICache.get_backend().set(key, raw, expire=int(CACHE_HARD_TTL))
+    return remember_encoded(key, quote, raw, entry)
+
+async def compute_and_store_pairs(key: str, quote: str) -> EncodedPairs:
+    """Recompute the pair list, refreshing the markets first if the snapshot is past the soft TTL."""
+    snapshot = await get_snapshot()
+    # A restored snapshot is already being replaced by the refresher, so never block on it
+    if snapshot.age >= CACHE_SOFT_TTL and not snapshot.restored:
+        try:
+            snapshot = await refresh_snapshot() or snapshot
+        except Exception as e:
+            logger.warning(f"Market refresh failed, recomputing from snapshot v{snapshot.version}: {e}")
+
+    return await store_pairs(key, quote, snapshot)
+
+async def warm_pairs_cache(snapshot: MarketSnapshot, quotes: List[str]) -> List[str]:
+    """Precompute and store the endpoint response for each quote under the key the endpoint reads."""
+    keys = [pairs_cache_key(quote) for quote in quotes]
+    await asyncio.gather(*(store_pairs(key, quote, snapshot) for key, quote in zip(keys, quotes)))
+    return keys
+
+def _revalidation_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background revalidation failed: {task.exception()}")
+
+def schedule_revalidation(key: str, quote: str):
+    """Refresh a cache entry in the background unless a refresh for it is already running."""
+    if single_flight.is_inflight(key):
+        return
+    task = asyncio.create_task(single_flight.do(key, lambda: compute_and_store_pairs(key, quote)))
+    _background_tasks.add(task)
+    task.add_done_callback(_revalidation_done)
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    encodings = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            encodings.add(coding.lower())
+    return encodings
+
+def coding_etag(etag: str, coding: str) -> str:
+    # Each content-coding is a different byte sequence, so each needs its own strong validator
+    return f'"{etag}-{coding}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True for "*" or any content-coding variant of the current body's ETag."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag.removeprefix("W/").strip('"')
+        if tag.rpartition("-")[0] == etag:
+            return True
+    return False
+
+def pairs_response(request: Request, encoded: EncodedPairs) -> Response:
+    age = time.time() - encoded.computed_at
+    headers = {
+        "Vary": "Accept-Encoding",
+        "Age": str(int(age)),
+        "Cache-Control": f"max-age={max(0, int(CACHE_SOFT_TTL - age))}",
+        "X-Pairlist-Stale": "true" if age >= CACHE_SOFT_TTL or encoded.restored else "false",
+    }
+
+    accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+    coding = next((coding for coding in ("br", "gzip") if coding in accepted and coding in encoded.bodies), "identity")
+    headers["ETag"] = coding_etag(encoded.etag, coding)
+
+    if etag_matches(request.headers.get("if-none-match", ""), encoded.etag):
+        return Response(status_code=304, headers=headers)
+
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(encoded.bodies[coding], media_type="application/json", headers=headers)
+
+# ----------------------------
+# Profiles
+# ----------------------------
+
+# Encoded result per profile, rebuilt once per snapshot or override change; all of them share the one snapshot
+_profile_results: Dict[str, EncodedPairs] = {}
+
+def precompute_profiles(snapshot: MarketSnapshot):
+    global _profile_results
+    results = {}
+    for name, profile in pair_overrides.profiles.items():
+        pairs = compute_spot_not_in_futures(snapshot, profile.quote, profile.include, profile.exclude)
+        results[name] = encode_pairs(f"profile:{name}", build_entry(snapshot, pairs))
+    # Swap the whole dict so readers never see a half-rebuilt set of profiles
+    _profile_results = results
+
+# ----------------------------
+# Routes
+# ----------------------------
+
+def require_known_quote(snapshot: MarketSnapshot, quote: str):
+    """Reject quotes the snapshot does not list, so arbitrary strings never create cache entries."""
+    if quote not in snapshot.index.spot_pairs and quote not in WARM_QUOTES:
+        raise HTTPException(status_code=404, detail=f"Unknown quote {quote}")
+
+@app.get("/spot_pairs_not_in_futures")
+async def get_spot_pairs_not_in_futures(request: Request, quote: str = "USDT", profile: Optional[str] = None):
+    if profile is not None:
+        if profile not in pair_overrides.profiles:
+            raise HTTPException(status_code=404, detail=f"Unknown profile {profile}")
+        await get_snapshot()
+        encoded = _profile_results.get(profile)
+        if encoded is None:
+            # Profile added since the last precompute
+            precompute_profiles(_snapshot)
+            encoded = _profile_results[profile]
+        return pairs_response(request, encoded)
+
+    quote = quote.upper()
+    require_known_quote(_snapshot or await get_snapshot(), quote)
+    key = pairs_cache_key(quote)
+    entry = await read_cached_pairs(key, quote)
+    age = time.time() - entry.computed_at if entry is not None else None
+
+    if entry is None or age >= CACHE_HARD_TTL or (CACHE_MODE != "swr" and age >= CACHE_SOFT_TTL):
+        # Concurrent misses share a single computation
+        response_cache_stats["misses"] += 1
+        entry = await single_flight.do(key, lambda: compute_and_store_pairs(key, quote))
+    elif (age >= CACHE_SOFT_TTL or entry.overrides != pair_overrides.revision
+          or (_snapshot is not None and entry.version < _snapshot.version)):
+        # Serve the last good list immediately and refresh it behind the response
+        response_cache_stats["stale_hits"] += 1
+        schedule_revalidation(key, quote)
+    else:
+        response_cache_stats["hits"] += 1
+
+    return pairs_response(request, entry)
+
+@app.get("/spot_pairs_not_in_futures/changes")
+async def get_spot_pairs_not_in_futures_changes(since: str = "", quote: str = "USDT"):
+    feed = get_change_feed(quote)
+    await get_snapshot()
+    return Response(dumps(feed.changes_since(since)), media_type="application/json")
+
+@app.get("/spot_pairs_not_in_futures/stream")
+async def stream_spot_pairs_not_in_futures(request: Request, quote: str = "USDT"):
+    feed = get_change_feed(quote)
+    await get_snapshot()
+    subscriber = broadcaster.subscribe(quote.upper(), feed)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event, version, payload = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {version}\nevent: {event}\ndata: {payload}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/spot_pairs_not_in_futures/ws")
+async def websocket_spot_pairs_not_in_futures(websocket: WebSocket, quote: str = "USDT"):
+    feed = change_feeds.get(quote.upper())
+    if feed is None:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        await get_snapshot()
+    except HTTPException:
+        # 1013: try again later, the first market load has not finished
+        await websocket.close(code=1013)
+        return
+    subscriber = broadcaster.subscribe(quote.upper(), feed)
+
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # Watch the client side so idle connections are released as soon as they close
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    try:
+        while True:
+            message = asyncio.create_task(subscriber.queue.get())
+            await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not message.done():
+                message.cancel()
+                break
+            await websocket.send_text(message.result()[2])
+    except Exception as e:
+        logger.debug(f"WebSocket subscriber closed: {e}")
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+@app.get("/pairs_gap")
+async def get_pairs_gap(spot: str = "binance", futures: str = "binance", quote: str = "USDT"):
+    quote = quote.upper()
+    spot_snapshot = venue_snapshot(spot)
+    futures_snapshot = venue_snapshot(futures)
+
+    # Serialize each venue combination once per pair of snapshots
+    gap_key = (spot.lower(), futures.lower(), quote)
+    cached = _gap_bodies.get(gap_key)
+    if cached is not None and cached[0] is spot_snapshot and cached[1] is futures_snapshot:
+        body = cached[2]
+    else:
+        spot_pairs = spot_snapshot.index.spot_pairs.get(quote, frozenset())
+        futures_pairs = futures_snapshot.index.futures_pairs.get(quote, frozenset())
+        body = dumps({"spot": gap_key[0], "futures": gap_key[1], "pairs": sorted(spot_pairs - futures_pairs)})
+        if quote in spot_snapshot.index.spot_pairs:
+            _gap_bodies[gap_key] = (spot_snapshot, futures_snapshot, body)
+
+    headers = {"X-Pairlist-Age": f"spot={spot_snapshot.age:.3f}, futures={futures_snapshot.age:.3f}"}
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/pairs")
+async def get_pairs(
+    venue: str = "binance",
+    quote: Optional[str] = None,
+    max_min_notional: Optional[float] = None,
+    max_tick_size: Optional[float] = None,
+    min_listing_days: Optional[float] = None,
+    min_volume: Optional[float] = None,
+    exclude_futures: bool = False,
+):
+    snapshot = venue_snapshot(venue)
+    # A filter on a column the venue never reports would silently match nothing
+    if min_listing_days is not None and snapshot.table.listed_at.known == 0:
+        raise HTTPException(status_code=400, detail=f"{venue} does not report listing times; min_listing_days is unsupported")
+    if min_volume is not None and snapshot.table.volume.known == 0:
+        raise HTTPException(status_code=400, detail=f"No ticker volumes are loaded for {venue}; min_volume is unsupported")
+    listed_before = time.time() * 1000 - min_listing_days * 86_400_000 if min_listing_days is not None else None
+
+    pairs = snapshot.table.query(
+        quote=quote.upper() if quote else None,
+        max_min_notional=max_min_notional,
+        max_tick_size=max_tick_size,
+        listed_before=listed_before,
+        min_volume=min_volume,
+        exclude_futures=exclude_futures,
+    )
+    return Response(dumps({"version": snapshot.version, "count": len(pairs), "pairs": pairs}), media_type="application/json")
+
+@app.get("/refresh_cache")
+async def refresh_cache(quote: Optional[List[str]] = Query(None)):
+    quotes = [q.upper() for q in quote] if quote else WARM_QUOTES
+    # Validate against the current snapshot first so bad quotes never trigger an exchange refresh
+    current = _snapshot or await get_snapshot()
+    for q in quotes:
+        require_known_quote(current, q)
+
+    try:
+        snapshot = await refresh_snapshot()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Market refresh failed: {e}")
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Markets are not loaded yet")
+
+    # Overwrite the entries in place so readers never see a miss during the refresh
+    keys = await warm_pairs_cache(snapshot, quotes)
+
+    return {"status": "Cache refreshed", "version": snapshot.version, "warmed": keys}
+
+@app.get("/cache_stats")
+async def cache_stats():
+    return {"responses": response_cache_stats, "single_flight": single_flight.stats(), "subscribers": broadcaster.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(generate_latest(METRICS_REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/upstream_stats")
+async def upstream_stats():
+    return {name: guard.stats() for name, guard in upstream_guards.items()}
 
 @app.on_event("startup")
 async def startup():
-    FastAPICache.init(InMemoryBackend())
+    global refresh_lease
+    backend, refresh_lease = create_cache_backend(CACHE_BACKEND, REDIS_URL, CACHE_DIR, REFRESH_LEASE_TTL)
+    FastAPICache.init(backend, prefix="pairlist")
+    try:
+        load_overrides_if_changed()
+    except Exception as e:
+        # Start without overrides; the watcher keeps retrying until the file is fixed
+        logger.error(f"Loading pair overrides failed, starting without them: {e}")
+    restore_snapshots()
+    open_exchanges()
+    _service_tasks.append(asyncio.create_task(snapshot_refresher()))
+    _service_tasks.append(asyncio.create_task(venue_refresher()))
+    _service_tasks.append(asyncio.create_task(overrides_watcher()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    tasks = list(_background_tasks) + _service_tasks
+    _service_tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_exchanges()
+    await refresh_lease.release()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,114 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+# ----------------------------
+# Bitmap Columns
+# ----------------------------
+
+# Rows are identified by their position in PairTable.symbols; a set of rows is an int with those bits set.
+
+class BitmapColumn:
+    """One numeric market attribute, sorted once, with prefix bitmaps so range filters are a bisect and a lookup."""
+
+    def __init__(self, values: Sequence[Optional[float]]):
+        known = sorted((value, row) for row, value in enumerate(values) if value is not None)
+        self.sorted_values = [value for value, _ in known]
+
+        # prefixes[k] holds the rows of the k smallest values
+        bitmap = 0
+        self.prefixes = [0]
+        for _, row in known:
+            bitmap |= 1 << row
+            self.prefixes.append(bitmap)
+        self.known = bitmap
+
+    def at_most(self, value: float) -> int:
+        return self.prefixes[bisect_right(self.sorted_values, value)]
+
+    def at_least(self, value: float) -> int:
+        return self.known & ~self.prefixes[bisect_left(self.sorted_values, value)]
+
+# ----------------------------
+# Pair Table
+# ----------------------------
+
+@dataclass(frozen=True)
+class PairTable:
+    """Columnar index over the active spot markets of one snapshot."""
+    symbols: Tuple[str, ...]
+    all_rows: int
+    quotes: Mapping[str, int]
+    has_futures: int
+    min_notional: BitmapColumn
+    tick_size: BitmapColumn
+    # Listing time in milliseconds since the epoch, where the exchange reports one
+    listed_at: BitmapColumn
+    # 24h quote volume, where ticker data is available
+    volume: BitmapColumn
+
+    def symbols_for(self, rows: int) -> List[str]:
+        """Decode a row bitmap into symbols, in the table's sorted order."""
+        symbols = []
+        while rows:
+            lowest = rows & -rows
+            symbols.append(self.symbols[lowest.bit_length() - 1])
+            rows ^= lowest
+        return symbols
+
+    def query(self, quote: Optional[str] = None, max_min_notional: Optional[float] = None,
+              max_tick_size: Optional[float] = None, listed_before: Optional[float] = None,
+              min_volume: Optional[float] = None, exclude_futures: bool = False) -> List[str]:
+        rows = self.all_rows
+        if quote is not None:
+            rows &= self.quotes.get(quote, 0)
+        if exclude_futures:
+            rows &= ~self.has_futures
+        if max_min_notional is not None:
+            rows &= self.min_notional.at_most(max_min_notional)
+        if max_tick_size is not None:
+            rows &= self.tick_size.at_most(max_tick_size)
+        if listed_before is not None:
+            rows &= self.listed_at.at_most(listed_before)
+        if min_volume is not None:
+            rows &= self.volume.at_least(min_volume)
+        return self.symbols_for(rows)
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def build_pair_table(spot_markets: Mapping[str, dict], futures_pairs: Mapping[str, frozenset],
+                     tickers: Optional[Mapping[str, dict]] = None) -> PairTable:
+    """Build the table from ccxt spot markets, the normalized perp pairs per quote and optional tickers."""
+    tickers = tickers or {}
+    symbols = tuple(sorted(symbol for symbol, data in spot_markets.items() if data['active'] and data.get('spot')))
+
+    quotes: Dict[str, int] = {}
+    has_futures = 0
+    min_notional, tick_size, listed_at, volume = [], [], [], []
+    for row, symbol in enumerate(symbols):
+        data = spot_markets[symbol]
+        bit = 1 << row
+        quotes[data['quote']] = quotes.get(data['quote'], 0) | bit
+        if symbol in futures_pairs.get(data['quote'], ()):
+            has_futures |= bit
+
+        min_notional.append(_number(((data.get('limits') or {}).get('cost') or {}).get('min')))
+        tick_size.append(_number((data.get('precision') or {}).get('price')))
+        listed_at.append(_number(data.get('created')))
+        volume.append(_number((tickers.get(symbol) or {}).get('quoteVolume')))
+
+    return PairTable(
+        symbols=symbols,
+        all_rows=(1 << len(symbols)) - 1,
+        quotes=MappingProxyType(quotes),
+        has_futures=has_futures,
+        min_notional=BitmapColumn(min_notional),
+        tick_size=BitmapColumn(tick_size),
+        listed_at=BitmapColumn(listed_at),
+        volume=BitmapColumn(volume),
+    )
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import shutil
+import socket
+import subprocess
+import pytest
+
+# The service modules import each other as top-level modules, as when run from pairlist/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture(scope="session")
+def redis_url():
+    """A throwaway local redis-server for the session, or None when only fakeredis is available."""
+    if shutil.which("redis-server") is None:
+        yield None
+        return
+
+    port = _free_port()
+    server = subprocess.Popen(["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+                              stdout=subprocess.DEVNULL)
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    yield f"redis://127.0.0.1:{port}/0"
+    server.terminate()
+    server.wait()
+
+@pytest.fixture
+def async_redis(redis_url):
+    """An asyncio Redis client against the local server, falling back to fakeredis with Lua support."""
+    if redis_url is not None:
+        from redis import asyncio as aioredis
+        return aioredis.from_url(redis_url)
+
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa", reason="fakeredis needs lupa to run the lease Lua scripts")
+    return fakeredis.FakeAsyncRedis()
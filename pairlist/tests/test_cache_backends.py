@@ -0,0 +1,122 @@
+import os
+import asyncio
+import pytest
+
+pytest.importorskip("fastapi_cache")
+import cache_backends
+from cache_backends import FileBackend, FileLease, RedisLease
+
+def run(coro):
+    return asyncio.run(coro)
+
+# ----------------------------
+# File Backend
+# ----------------------------
+
+def test_file_backend_round_trip(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    run(backend.set("pairlist:spot:USDT", b"payload"))
+    assert run(backend.get("pairlist:spot:USDT")) == b"payload"
+    assert run(backend.get_with_ttl("pairlist:spot:USDT")) == (-1, b"payload")
+    assert run(backend.get("pairlist:missing")) is None
+
+def test_file_backend_expiry(tmp_path, monkeypatch):
+    backend = FileBackend(str(tmp_path))
+    now = 1_700_000_000.0
+    monkeypatch.setattr(cache_backends.time, "time", lambda: now)
+    run(backend.set("key", "value", expire=30))
+    assert run(backend.get_with_ttl("key")) == (30, b"value")
+
+    now += 31
+    assert run(backend.get("key")) is None
+    assert run(backend.get_with_ttl("key")) == (-1, None)
+
+def test_file_backend_writes_atomically(tmp_path, monkeypatch):
+    backend = FileBackend(str(tmp_path))
+    run(backend.set("key", b"old"))
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    # A write that dies before the rename leaves the previous entry intact
+    monkeypatch.setattr(cache_backends.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        run(backend.set("key", b"new"))
+    monkeypatch.undo()
+    assert run(backend.get("key")) == b"old"
+
+    run(backend.set("key", b"new"))
+    assert run(backend.get("key")) == b"new"
+
+def test_file_backend_clear_skips_temp_files(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    run(backend.set("pairlist:a", b"1"))
+    run(backend.set("pairlist:b", b"2"))
+    run(backend.set("other:c", b"3"))
+    (tmp_path / ".tmp-inflight").write_bytes(b"")
+
+    assert run(backend.clear(namespace="pairlist")) == 2
+    assert run(backend.get("other:c")) == b"3"
+    assert os.path.exists(tmp_path / ".tmp-inflight")
+
+# ----------------------------
+# File Lease
+# ----------------------------
+
+def test_file_lease_is_exclusive(tmp_path):
+    path = str(tmp_path / "refresh.lock")
+    leader, follower = FileLease(path), FileLease(path)
+
+    assert run(leader.acquire())
+    assert run(leader.acquire())
+    assert not run(follower.acquire())
+    assert leader.held and not follower.held
+
+    run(leader.release())
+    assert run(follower.acquire())
+    run(follower.release())
+
+# ----------------------------
+# Redis Lease
+# ----------------------------
+
+def test_redis_lease_acquire_renew_release(async_redis, monkeypatch):
+    async def scenario():
+        leader = RedisLease(async_redis, "test:lease", ttl=30)
+        follower = RedisLease(async_redis, "test:lease", ttl=30)
+        await async_redis.delete("test:lease")
+
+        monkeypatch.setattr(cache_backends, "WORKER_ID", "worker-a")
+        assert await leader.acquire()
+        # Renewing extends the lease instead of failing on the existing key
+        assert await leader.acquire()
+        assert await async_redis.get("test:lease") == b"worker-a"
+
+        monkeypatch.setattr(cache_backends, "WORKER_ID", "worker-b")
+        assert not await follower.acquire()
+        # Release only deletes a lease the caller holds
+        await RedisLease(async_redis, "test:lease", ttl=30).release()
+        assert await async_redis.get("test:lease") == b"worker-a"
+
+        monkeypatch.setattr(cache_backends, "WORKER_ID", "worker-a")
+        await leader.release()
+        assert not leader.held
+
+        monkeypatch.setattr(cache_backends, "WORKER_ID", "worker-b")
+        assert await follower.acquire()
+        await follower.release()
+
+    run(scenario())
+
+def test_redis_lease_expires_without_renewal(async_redis, monkeypatch):
+    async def scenario():
+        await async_redis.delete("test:expiring")
+        monkeypatch.setattr(cache_backends, "WORKER_ID", "worker-a")
+        assert await RedisLease(async_redis, "test:expiring", ttl=0.2).acquire()
+
+        monkeypatch.setattr(cache_backends, "WORKER_ID", "worker-b")
+        assert not await RedisLease(async_redis, "test:expiring", ttl=0.2).acquire()
+        await asyncio.sleep(0.3)
+        assert await RedisLease(async_redis, "test:expiring", ttl=0.2).acquire()
+
+    run(scenario())
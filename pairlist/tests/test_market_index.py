@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("fastapi_cache")
+pytest.importorskip("ccxt")
+import main3
+
+def market(base: str, quote: str = "USDT", **kind) -> dict:
+    return {'base': base, 'quote': quote, 'active': True, 'settle': quote if kind.get('swap') else None, **kind}
+
+# Prefixed futures bases whose leading M may or may not belong to the spot base
+MULTIPLIER_CASES = {
+    "1000000MOG": ("MOG/USDT", 1_000_000),
+    "1000MEW": ("MEW/USDT", 1000),
+    "1MBABYDOGE": ("BABYDOGE/USDT", 1_000_000),
+    "1000PEPE": ("PEPE/USDT", 1000),
+}
+
+@pytest.fixture
+def index():
+    # OG/USDT and EW/USDT are decoys that a greedy M-strip would map MOG and MEW onto
+    spot = {symbol: market(symbol.split('/')[0], spot=True)
+            for symbol in [*(expected for expected, _ in MULTIPLIER_CASES.values()), "OG/USDT", "EW/USDT"]}
+    futures = {f"{base}/USDT:USDT": market(base, swap=True) for base in MULTIPLIER_CASES}
+    return main3.build_market_index(spot, futures)
+
+@pytest.mark.parametrize("base", MULTIPLIER_CASES)
+def test_prefixed_bases_map_to_their_spot_pair(index, base):
+    expected_symbol, expected_multiplier = MULTIPLIER_CASES[base]
+    assert index.futures_to_spot[f"{base}/USDT:USDT"] == expected_symbol
+    assert index.multipliers[f"{base}/USDT:USDT"] == expected_multiplier
+
+def test_decoys_stay_spot_only(index):
+    assert sorted(index.spot_pairs["USDT"] - index.futures_pairs["USDT"]) == ["EW/USDT", "OG/USDT"]
+
+def test_unlisted_prefixed_base_keeps_its_m():
+    index = main3.build_market_index({}, {"1000MNT/USDT:USDT": market("1000MNT", swap=True)})
+    assert index.futures_to_spot["1000MNT/USDT:USDT"] == "MNT/USDT"
+    assert index.multipliers["1000MNT/USDT:USDT"] == 1000
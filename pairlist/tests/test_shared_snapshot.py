@@ -0,0 +1,65 @@
+import time
+import asyncio
+import pytest
+
+pytest.importorskip("fastapi_cache")
+pytest.importorskip("ccxt")
+from fastapi_cache import FastAPICache
+from cache_backends import FileBackend
+import main3
+
+def market(base: str, quote: str = "USDT", **kind) -> dict:
+    return {'base': base, 'quote': quote, 'active': True, 'settle': quote if kind.get('swap') else None, **kind}
+
+SPOT = {f"{base}/USDT": market(base, spot=True) for base in ("BTC", "ETH", "WIF")}
+FUTURES = {f"{base}/USDT:USDT": market(base, swap=True) for base in ("BTC", "ETH")}
+
+@pytest.fixture
+def shared_backend(tmp_path, monkeypatch):
+    """Leader and followers on one host sharing snapshots through the file backend."""
+    monkeypatch.setattr(main3, "CACHE_BACKEND", "file")
+    monkeypatch.setattr(main3, "pair_overrides", main3.PairOverrides())
+    FastAPICache.init(FileBackend(str(tmp_path)), prefix="pairlist")
+    yield
+    FastAPICache.reset()
+
+def test_follower_picks_up_published_snapshot(shared_backend):
+    async def scenario():
+        leader_snapshot = main3.make_snapshot(3, time.time(), SPOT, FUTURES)
+        await main3.publish_shared_snapshot("binance", leader_snapshot)
+        assert await main3.read_shared_version("binance") == 3
+
+        synced = await main3.read_shared_snapshot("binance", None)
+        assert synced.version == 3
+        assert synced.index.spot_pairs == leader_snapshot.index.spot_pairs
+        assert synced.index.futures_pairs == leader_snapshot.index.futures_pairs
+        assert main3.compute_spot_not_in_futures(synced) == ["WIF/USDT"]
+
+    asyncio.run(scenario())
+
+def test_follower_keeps_current_unless_shared_is_newer(shared_backend):
+    async def scenario():
+        current = main3.make_snapshot(5, time.time(), SPOT, FUTURES)
+        # Nothing published yet
+        assert await main3.read_shared_snapshot("binance", current) is current
+
+        await main3.publish_shared_snapshot("binance", main3.make_snapshot(4, time.time(), SPOT, FUTURES))
+        assert await main3.read_shared_snapshot("binance", current) is current
+
+        await main3.publish_shared_snapshot("binance", main3.make_snapshot(6, time.time(), SPOT, {}))
+        newer = await main3.read_shared_snapshot("binance", current)
+        assert newer.version == 6
+        assert main3.compute_spot_not_in_futures(newer) == ["BTC/USDT", "ETH/USDT", "WIF/USDT"]
+
+    asyncio.run(scenario())
+
+def test_memory_backend_never_shares(monkeypatch):
+    monkeypatch.setattr(main3, "CACHE_BACKEND", "memory")
+    monkeypatch.setattr(main3, "pair_overrides", main3.PairOverrides())
+
+    async def scenario():
+        await main3.publish_shared_snapshot("binance", main3.make_snapshot(1, time.time(), SPOT, FUTURES))
+        assert await main3.read_shared_version("binance") == 0
+        assert await main3.read_shared_snapshot("binance", None) is None
+
+    asyncio.run(scenario())
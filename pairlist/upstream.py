@@ -0,0 +1,166 @@
+import time
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+import ccxt
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an exchange while its circuit is open."""
+
+# ----------------------------
+# Token Bucket
+# ----------------------------
+
+class TokenBucket:
+    """Request-weight budget refilled continuously over the exchange's rate-limit window."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, weight: float):
+        self._refill()
+        while self.tokens < weight:
+            await asyncio.sleep((weight - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= weight
+
+    def observe_used(self, used: float):
+        """Align the budget with the weight the exchange says this IP has already used in the window."""
+        self._refill()
+        self.tokens = min(self.tokens, max(0.0, self.capacity - used))
+
+# ----------------------------
+# Circuit Breaker
+# ----------------------------
+
+class CircuitBreaker:
+    """Stop calling an exchange after repeated failures or a ban, then let one trial call through."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self._open_until = 0.0
+
+    def before_call(self):
+        if self.state == "open":
+            remaining = self._open_until - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(f"circuit open for another {remaining:.0f}s")
+            self.state = "half_open"
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.open(self.reset_timeout)
+
+    def open(self, duration: float):
+        self.state = "open"
+        self.trips += 1
+        self._open_until = time.monotonic() + duration
+
+# ----------------------------
+# Upstream Guard
+# ----------------------------
+
+def header_value(headers, name: str) -> Optional[str]:
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def retry_after_seconds(value: Optional[str], default: float = 60.0) -> float:
+    """Parse a Retry-After header, which is either delay-seconds or an HTTP-date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return default
+
+class UpstreamGuard:
+    """Rate limiter, circuit breaker and weight metrics wrapped around one ccxt client."""
+
+    def __init__(self, name: str, client, weight_limit: float, weight_header: Optional[str] = None,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.client = client
+        self.weight_header = weight_header
+        self.bucket = TokenBucket(weight_limit)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.calls = 0
+        self.rejected = 0
+        self.errors = 0
+        self.weight_spent = 0.0
+        self.used_weight: Optional[float] = None
+
+    async def call(self, fn: Callable[[], Awaitable], weight: float = 1.0):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+
+        await self.bucket.acquire(weight)
+        self.calls += 1
+        self.weight_spent += weight
+        try:
+            result = await fn()
+        except ccxt.DDoSProtection as e:
+            # 418/429: back off for as long as the exchange asks, or a full window
+            self.errors += 1
+            retry_after = header_value(getattr(self.client, "last_response_headers", None), "retry-after")
+            self.breaker.open(retry_after_seconds(retry_after))
+            self.bucket.observe_used(self.bucket.capacity)
+            logger.warning(f"{self.name} rate limited, circuit open: {e}")
+            raise
+        except Exception:
+            self.errors += 1
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        self._observe_headers()
+        return result
+
+    def _observe_headers(self):
+        if self.weight_header is None:
+            return
+        used = header_value(getattr(self.client, "last_response_headers", None), self.weight_header)
+        if used is not None:
+            self.used_weight = float(used)
+            self.bucket.observe_used(self.used_weight)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "weight_spent": self.weight_spent,
+            "used_weight": self.used_weight,
+            "weight_limit": self.bucket.capacity,
+            "tokens": round(self.bucket.tokens, 1),
+            "circuit": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+        }
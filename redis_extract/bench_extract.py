@@ -0,0 +1,79 @@
+import time
+import argparse
+import subprocess
+import redis
+from test2 import read_value, read_values, scan_keys, scan_pages
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare per-key and pipelined extraction against a local redis-server.")
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--count", type=int, default=1000, help="SCAN COUNT hint")
+    parser.add_argument("--port", type=int, default=6399)
+    parser.add_argument("--rtt", type=float, default=0.0,
+                        help="simulated round-trip time in ms added per server call, to model a remote host")
+    return parser.parse_args()
+
+class CountingConnection(redis.Connection):
+    """Connection that counts every send to the server, optionally sleeping to simulate a WAN round-trip."""
+    round_trips = 0
+    rtt = 0.0
+
+    def send_packed_command(self, *args, **kwargs):
+        # A pipeline sends all of its commands in one call, so each send is one round-trip
+        CountingConnection.round_trips += 1
+        if CountingConnection.rtt:
+            time.sleep(CountingConnection.rtt)
+        return super().send_packed_command(*args, **kwargs)
+
+def seed(client, total: int):
+    """Fill the database with a mix of small strings, lists, sets, hashes and zsets."""
+    client.flushdb()
+    pipe = client.pipeline(transaction=False)
+    for i in range(total):
+        kind = i % 5
+        if kind == 0:
+            pipe.set(f"string:{i}", f"value-{i}")
+        elif kind == 1:
+            pipe.rpush(f"list:{i}", *range(10))
+        elif kind == 2:
+            pipe.sadd(f"set:{i}", *range(10))
+        elif kind == 3:
+            pipe.hset(f"hash:{i}", mapping={f"field{j}": j for j in range(10)})
+        else:
+            pipe.zadd(f"zset:{i}", {f"member{j}": j for j in range(10)})
+        if i % 10_000 == 9_999:
+            pipe.execute()
+    pipe.execute()
+
+def run(label, fn):
+    CountingConnection.round_trips = 0
+    start = time.perf_counter()
+    extracted = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {extracted} keys in {elapsed:.2f}s ({extracted / elapsed:,.0f} keys/s), "
+          f"{CountingConnection.round_trips} round-trips ({CountingConnection.round_trips / extracted:.3f} per key)")
+
+def main(args):
+    server = subprocess.Popen(["redis-server", "--port", str(args.port), "--save", "", "--appendonly", "no"],
+                              stdout=subprocess.DEVNULL)
+    try:
+        pool = redis.ConnectionPool(port=args.port, connection_class=CountingConnection)
+        client = redis.StrictRedis(connection_pool=pool)
+        for _ in range(50):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.1)
+
+        seed(client, args.keys)
+        CountingConnection.rtt = args.rtt / 1000
+
+        run("per-key", lambda: sum(1 for key in scan_keys(client, count=args.count) if read_value(client, key)))
+        run("pipelined", lambda: sum(len(read_values(client, keys)) for keys in scan_pages(client, count=args.count)))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main(parse_args())
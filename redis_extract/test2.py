@@ -1,27 +1,289 @@
+import sys
+import time
+import string
+import argparse
+import multiprocessing
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
 import redis
+from writers import WRITERS, create_writer
 
-# Connect to Redis
-redis_client = redis.StrictRedis(host='', port=6379, db=0, decode_responses=True)
-
-# Retrieve all keys
-keys = redis_client.keys('*')
-
-# Print keys and their values depending on their type
-for key in keys:
-    key_type = redis_client.type(key)
-    
-    if key_type == 'string':
-        value = redis_client.get(key)
-    elif key_type == 'list':
-        value = redis_client.lrange(key, 0, -1)
-    elif key_type == 'set':
-        value = redis_client.smembers(key)
-    elif key_type == 'hash':
-        value = redis_client.hgetall(key)
-    elif key_type == 'zset':
-        value = redis_client.zrange(key, 0, -1, withscores=True)
-    else:
-        value = f"Unsupported type: {key_type}"
-    
-    print(f"Key: {key}, Type: {key_type}, Value: {value}")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream every key of a Redis instance with its type and value.")
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--match", default="*", help="SCAN MATCH pattern")
+    parser.add_argument("--count", type=int, default=1000, help="SCAN COUNT hint, roughly the keys per server call")
+    parser.add_argument("--big-key-threshold", type=int, default=10_000,
+                        help="collections with more elements than this are streamed in chunks")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="elements per HSCAN/SSCAN/ZSCAN or LRANGE call")
+    parser.add_argument("--workers", type=int, default=1, help="export processes; more than 1 requires --output")
+    parser.add_argument("--output", default="-",
+                        help="output file, or the shard path prefix for a parallel export; - for stdout")
+    parser.add_argument("--format", default="text", choices=list(WRITERS))
+    parser.add_argument("--compress", action="store_true", help="zstd-compress the output")
+    parser.add_argument("--cluster", action="store_true", help="treat --host/--port as a Redis Cluster seed node")
+    return parser.parse_args()
 
+# ----------------------------
+# Key Iteration
+# ----------------------------
+
+def scan_pages(redis_client, match: str = "*", count: int = 1000):
+    """Yield the keys of each SCAN call as one list so callers can batch work per page."""
+    cursor = 0
+    while True:
+        cursor, keys = redis_client.scan(cursor, match=match, count=count)
+        if keys:
+            yield keys
+        if cursor == 0:
+            return
+
+def scan_keys(redis_client, match: str = "*", count: int = 1000):
+    """Yield key names one SCAN batch at a time so neither the server nor the client holds the whole keyspace."""
+    for keys in scan_pages(redis_client, match, count):
+        yield from keys
+
+# ----------------------------
+# Value Extraction
+# ----------------------------
+
+# Command used to read a whole value of each type
+VALUE_READERS = {
+    'string': lambda client, key: client.get(key),
+    'list': lambda client, key: client.lrange(key, 0, -1),
+    'set': lambda client, key: client.smembers(key),
+    'hash': lambda client, key: client.hgetall(key),
+    'zset': lambda client, key: client.zrange(key, 0, -1, withscores=True),
+}
+
+def type_name(reply) -> str:
+    # Clients without decode_responses may hand TYPE replies back as bytes
+    return reply.decode() if isinstance(reply, bytes) else reply
+
+def read_value(redis_client, key):
+    """Read one key with a TYPE round-trip followed by a value round-trip."""
+    key_type = type_name(redis_client.type(key))
+    reader = VALUE_READERS.get(key_type)
+    if reader is None:
+        return key_type, f"Unsupported type: {key_type}"
+    return key_type, reader(redis_client, key)
+
+# Cardinality command per collection type, used to decide whether a key is read whole or in chunks
+CARDINALITY = {
+    'list': lambda client, key: client.llen(key),
+    'set': lambda client, key: client.scard(key),
+    'hash': lambda client, key: client.hlen(key),
+    'zset': lambda client, key: client.zcard(key),
+}
+
+def read_values(redis_client, keys, big_key_threshold: int = 10_000, chunk_size: int = 1000):
+    """Read a page of keys in three round-trips: TYPEs, collection sizes, then whole reads of the small keys.
+
+    Collections with more than big_key_threshold elements come back as a lazy iterator over their elements
+    instead of a materialized value.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+    key_types = [type_name(reply) for reply in pipe.execute()]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for key, key_type in zip(keys, key_types):
+        if key_type in CARDINALITY:
+            CARDINALITY[key_type](pipe, key)
+    sizes = iter(pipe.execute(raise_on_error=False))
+
+    big_keys = set()
+    pipe = redis_client.pipeline(transaction=False)
+    for key, key_type in zip(keys, key_types):
+        if key_type in CARDINALITY:
+            size = next(sizes)
+            if isinstance(size, int) and size > big_key_threshold:
+                big_keys.add(key)
+                continue
+        reader = VALUE_READERS.get(key_type)
+        if reader is not None:
+            reader(pipe, key)
+    # A key can expire or be rewritten between the pipelines; report that per key instead of failing the page
+    values = iter(pipe.execute(raise_on_error=False))
+
+    results = []
+    for key, key_type in zip(keys, key_types):
+        if key_type not in VALUE_READERS:
+            value = f"Unsupported type: {key_type}"
+        elif key in big_keys:
+            value = iter_elements(redis_client, key, key_type, chunk_size)
+        else:
+            value = next(values)
+            if isinstance(value, Exception):
+                value = f"Read failed: {value}"
+        results.append((key, key_type, value))
+    return results
+
+def extract(redis_client, match: str = "*", count: int = 1000, big_key_threshold: int = 10_000, chunk_size: int = 1000):
+    """Yield (key, type, value) for every key matching the pattern, pipelining the reads of each SCAN page."""
+    for keys in scan_pages(redis_client, match, count):
+        yield from read_values(redis_client, keys, big_key_threshold, chunk_size)
+
+# ----------------------------
+# Chunked Collections
+# ----------------------------
+
+def iter_list(redis_client, key, chunk_size: int = 1000):
+    """Yield list elements through LRANGE windows; a list modified mid-read may repeat or skip elements."""
+    start = 0
+    while True:
+        window = redis_client.lrange(key, start, start + chunk_size - 1)
+        yield from window
+        if len(window) < chunk_size:
+            return
+        start += chunk_size
+
+def iter_elements(redis_client, key, key_type: str, chunk_size: int = 1000):
+    """Stream a big collection a chunk at a time: list elements, set members, (field, value) or (member, score)."""
+    if key_type == 'list':
+        return iter_list(redis_client, key, chunk_size)
+    if key_type == 'set':
+        return redis_client.sscan_iter(key, count=chunk_size)
+    if key_type == 'hash':
+        return redis_client.hscan_iter(key, count=chunk_size)
+    if key_type == 'zset':
+        return redis_client.zscan_iter(key, count=chunk_size)
+    raise ValueError(f"Cannot chunk a {key_type} value")
+
+# ----------------------------
+# Parallel Export
+# ----------------------------
+
+# First characters that get their own SCAN MATCH class; keys starting with anything else go to a catch-all class
+PARTITION_ALPHABET = string.digits + string.ascii_letters
+GLOB_SPECIAL = "*?[]\\"
+
+@dataclass(frozen=True)
+class Partition:
+    """A slice of the keyspace: one server node and the MATCH patterns that select its share of the keys."""
+    host: str
+    port: int
+    patterns: Tuple[str, ...]
+    # A key named exactly after the pattern prefix matches none of the character classes, so one partition checks it
+    exact_key: Optional[str] = None
+
+def split_pattern(match: str) -> Tuple[str, str]:
+    """Split a MATCH pattern into its literal prefix and the rest, starting at the first glob character."""
+    for i, char in enumerate(match):
+        if char in GLOB_SPECIAL:
+            return match[:i], match[i:]
+    return match, ""
+
+def prefix_partitions(host: str, port: int, match: str, parts: int) -> List[Partition]:
+    """Split one node's keys by the first character after the pattern's literal prefix."""
+    prefix, rest = split_pattern(match)
+    if parts <= 1 or rest != "*":
+        # Only a trailing "*" leaves room to insert a character class without changing what matches
+        return [Partition(host, port, (match,))]
+
+    # Beyond one character per partition the extra groups would be empty classes that match nothing
+    parts = min(parts, len(PARTITION_ALPHABET))
+    groups = [PARTITION_ALPHABET[i::parts] for i in range(parts)]
+    partitions = [Partition(host, port, (f"{prefix}[{chars}]*",)) for chars in groups]
+    partitions[0] = Partition(host, port, (*partitions[0].patterns, f"{prefix}[^{PARTITION_ALPHABET}]*"), exact_key=prefix)
+    return partitions
+
+def plan_partitions(args) -> List[Partition]:
+    """Per-node partitions for a cluster, prefix partitions for a standalone server."""
+    if not args.cluster:
+        return prefix_partitions(args.host, args.port, args.match, args.workers)
+
+    from redis.cluster import RedisCluster
+    cluster = RedisCluster(host=args.host, port=args.port)
+    nodes = cluster.get_primaries()
+    # Only the primary that owns the exact key's slot can answer for it; any other node replies MOVED
+    owner = cluster.get_node_from_key(split_pattern(args.match)[0])
+    cluster.close()
+
+    # With more workers than primaries, each primary is split further by prefix
+    parts = max(1, args.workers // len(nodes))
+    return [
+        partition if (node.host, node.port) == (owner.host, owner.port) else replace(partition, exact_key=None)
+        for node in nodes
+        for partition in prefix_partitions(node.host, node.port, args.match, parts)
+    ]
+
+def output_path(args, shard: Optional[int] = None) -> str:
+    path = args.output if shard is None else f"{args.output}.{shard}{WRITERS[args.format].extension}"
+    if args.compress and args.format != "parquet" and path != "-":
+        path += ".zst"
+    return path
+
+def export_shard(shard: int, partitions: List[Partition], args, progress):
+    """Worker process: scan its partitions over its own connection pool and write its own output shard."""
+    with create_writer(args.format, output_path(args, shard), args.compress, args.chunk_size) as writer:
+        for partition in partitions:
+            # Cluster nodes only serve db 0; each worker talks to the node directly rather than through the cluster client
+            pool = redis.ConnectionPool(host=partition.host, port=partition.port, db=0 if args.cluster else args.db)
+            redis_client = redis.StrictRedis(connection_pool=pool)
+
+            if partition.exact_key is not None and redis_client.exists(partition.exact_key):
+                for record in read_values(redis_client, [partition.exact_key], args.big_key_threshold, args.chunk_size):
+                    writer.write(*record)
+                progress[shard] += 1
+
+            for pattern in partition.patterns:
+                for keys in scan_pages(redis_client, pattern, args.count):
+                    for record in read_values(redis_client, keys, args.big_key_threshold, args.chunk_size):
+                        writer.write(*record)
+                    progress[shard] += len(keys)
+            pool.disconnect()
+
+def parallel_export(args, report_interval: float = 1.0):
+    partitions = plan_partitions(args)
+    workers = min(args.workers, len(partitions))
+    progress = multiprocessing.Array('q', workers, lock=False)
+    processes = [
+        multiprocessing.Process(target=export_shard, args=(shard, partitions[shard::workers], args, progress))
+        for shard in range(workers)
+    ]
+
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    # Each worker only increments its own counter, so reading them without a lock is safe enough for progress
+    last_total, last_time = 0, started
+    while any(process.is_alive() for process in processes):
+        time.sleep(report_interval)
+        now, total = time.perf_counter(), sum(progress)
+        print(f"{total} keys, {(total - last_total) / (now - last_time):,.0f} keys/s now, "
+              f"{total / (now - started):,.0f} keys/s overall", file=sys.stderr)
+        last_total, last_time = total, now
+
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    total = sum(progress)
+    print(f"Exported {total} keys from {len(partitions)} partitions with {workers} workers in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} keys/s)", file=sys.stderr)
+
+    failed = [shard for shard, process in enumerate(processes) if process.exitcode != 0]
+    if failed:
+        print(f"Shards {failed} failed; their output is incomplete", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.workers > 1 or args.cluster:
+        if args.output == "-":
+            sys.exit("--output is required for a parallel or cluster export")
+        parallel_export(args)
+        sys.exit(0)
+
+    # Connect to Redis; replies stay raw bytes so binary values survive the export
+    redis_client = redis.StrictRedis(host=args.host, port=args.port, db=args.db)
+
+    # Write keys and their values depending on their type
+    with create_writer(args.format, output_path(args), args.compress, args.chunk_size) as writer:
+        for key, key_type, value in extract(redis_client, args.match, args.count, args.big_key_threshold, args.chunk_size):
+            writer.write(key, key_type, value)
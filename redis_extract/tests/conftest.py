@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The extractor modules import each other as top-level modules, as when run from redis_extract/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
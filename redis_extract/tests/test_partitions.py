@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("redis")
+from test2 import PARTITION_ALPHABET, prefix_partitions
+
+def test_prefix_partitions_cover_the_alphabet_once():
+    partitions = prefix_partitions("localhost", 6379, "user:*", 4)
+    classes = [pattern[len("user:["):-len("]*")] for partition in partitions for pattern in partition.patterns
+               if not pattern.startswith("user:[^")]
+    assert sorted("".join(classes)) == sorted(PARTITION_ALPHABET)
+    assert [partition.exact_key for partition in partitions] == ["user:", None, None, None]
+
+def test_prefix_partitions_are_capped_at_one_character_each():
+    partitions = prefix_partitions("localhost", 6379, "*", 200)
+    assert len(partitions) == len(PARTITION_ALPHABET)
+    assert all("[]" not in pattern for partition in partitions for pattern in partition.patterns)
+
+def test_complex_patterns_are_not_split():
+    assert len(prefix_partitions("localhost", 6379, "user:*:name", 8)) == 1
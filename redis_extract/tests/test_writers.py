@@ -0,0 +1,70 @@
+import json
+import math
+import struct
+import pytest
+import writers
+
+def ndjson_records(path) -> list:
+    def reject_constant(name):
+        raise ValueError(f"non-standard JSON constant {name}")
+    with open(path) as f:
+        return [json.loads(line, parse_constant=reject_constant) for line in f]
+
+ZSET = [(b"low", float("-inf")), (b"mid", 1.5), (b"high", float("inf"))]
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_ndjson_round_trips_infinite_scores(tmp_path, monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(writers, "orjson", None)
+
+    path = tmp_path / "out.ndjson"
+    with writers.NDJSONWriter(str(path)) as writer:
+        writer.write(b"scores", "zset", ZSET)
+        writer.write(b"streamed", "zset", iter(ZSET))
+
+    for record in ndjson_records(path):
+        assert [(member.encode(), float(score)) for member, score in record["value"]] == ZSET
+
+def test_ndjson_keeps_binary_values(tmp_path):
+    path = tmp_path / "out.ndjson"
+    with writers.NDJSONWriter(str(path)) as writer:
+        writer.write(b"\xffkey", "string", b"\x00\xfe")
+        writer.write(b"plain", "hash", {b"field": b"value"})
+
+    binary, plain = ndjson_records(path)
+    assert binary["key"] == {"b64": "/2tleQ=="}
+    assert binary["value"] == {"b64": "AP4="}
+    assert plain["value"] == [["field", "value"]]
+
+def test_msgpack_round_trips_infinite_scores(tmp_path):
+    msgpack = pytest.importorskip("msgpack")
+    path = tmp_path / "out.msgpack"
+    with writers.MsgpackWriter(str(path)) as writer:
+        writer.write(b"scores", "zset", ZSET)
+
+    raw = path.read_bytes()
+    (length,) = struct.unpack("!I", raw[:4])
+    record = msgpack.unpackb(raw[4:4 + length])
+    assert [tuple(pair) for pair in record["value"]] == ZSET
+
+def test_text_writer_streams_chunks(tmp_path):
+    path = tmp_path / "out.txt"
+    with writers.TextWriter(str(path), chunk_size=2) as writer:
+        writer.write(b"k", "string", b"v")
+        writer.write(b"big", "list", iter([b"a", b"b", b"c"]))
+        writer.write(b"odd", "stream", "Unsupported type: stream")
+
+    assert path.read_text().splitlines() == [
+        "Key: b'k', Type: string, Value: b'v'",
+        "Key: b'big', Type: list, Value:",
+        "    b'a'",
+        "    b'b'",
+        "    b'c'",
+        "Key: b'odd', Type: stream, Value: Unsupported type: stream",
+    ]
+
+def test_record_writer_requires_encode(tmp_path):
+    with pytest.raises(TypeError):
+        writers.RecordWriter(str(tmp_path / "out"))
@@ -0,0 +1,258 @@
+import sys
+import json
+import math
+import base64
+import struct
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Output buffer per writer; records are small, so writes are batched into large syscalls
+BUFFER_SIZE = 1 << 20
+
+# Approximate key and value bytes a Parquet writer holds in memory before writing a row group
+PARQUET_BATCH_BYTES = 64 << 20
+
+# ----------------------------
+# Records
+# ----------------------------
+
+# Every writer emits one record per key, or one per chunk of a streamed big collection:
+#   key    raw key bytes
+#   type   Redis type name
+#   part   None for a whole value, 0, 1, ... for the chunks of a streamed collection
+#   value  bytes for strings, a list of bytes for lists and sets, a list of [field, value] pairs for
+#          hashes and a list of [member, score] pairs for zsets
+#   error  why the value could not be read, in which case value is None
+
+def normalize(key_type: str, value):
+    """Turn a redis-py reply into the record value shape for its type."""
+    if key_type == 'hash' and isinstance(value, dict):
+        return [[field, item] for field, item in value.items()]
+    if key_type == 'zset':
+        return [[member, score] for member, score in value]
+    if key_type in ('list', 'set', 'hash'):
+        return [list(item) if isinstance(item, tuple) else item for item in value]
+    return value
+
+def records(key, key_type: str, value, chunk_size: int = 1000):
+    """Yield the records for one extracted key, chunking values that are still streaming from the server."""
+    if isinstance(value, str):
+        # read_values reports unsupported types and failed reads as a message instead of a value
+        yield {"key": key, "type": key_type, "part": None, "value": None, "error": value}
+    elif isinstance(value, Iterator):
+        for part, chunk in enumerate(iter(lambda: list(islice(value, chunk_size)), [])):
+            yield {"key": key, "type": key_type, "part": part, "value": normalize(key_type, chunk), "error": None}
+    else:
+        yield {"key": key, "type": key_type, "part": None, "value": normalize(key_type, value), "error": None}
+
+# ----------------------------
+# Writers
+# ----------------------------
+
+def open_output(path: str, compress: bool = False):
+    """Buffered binary output to a file or to stdout for "-", optionally through a zstd stream."""
+    out = sys.stdout.buffer if path == "-" else open(path, 'wb', buffering=BUFFER_SIZE)
+    if not compress:
+        return out
+    if zstandard is None:
+        raise RuntimeError("zstd compression needs the zstandard package")
+    return zstandard.ZstdCompressor().stream_writer(out, write_size=BUFFER_SIZE, closefd=path != "-")
+
+class RecordWriter(ABC):
+    """Streaming writer for one output; subclasses encode a single record."""
+    extension = ""
+
+    def __init__(self, path: str, compress: bool = False, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self.out = open_output(path, compress)
+        self._to_stdout = path == "-"
+
+    def write(self, key, key_type: str, value):
+        for record in records(key, key_type, value, self.chunk_size):
+            self.out.write(self.encode(record))
+
+    @abstractmethod
+    def encode(self, record: dict) -> bytes:
+        """Serialize one record, including any framing between records."""
+
+    def close(self):
+        if self.out is sys.stdout.buffer:
+            self.out.flush()
+            return
+        # Closing a zstd stream writer ends its frame; with closefd=False it leaves stdout itself open
+        self.out.close()
+        if self._to_stdout:
+            sys.stdout.buffer.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _json_bytes(value):
+    # JSON has no bytes type: UTF-8 values stay plain strings, anything else becomes {"b64": ...}
+    try:
+        return value.decode()
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(value).decode()}
+
+def _json_score(score: float):
+    # JSON has no infinities; write them the way Redis prints them so they parse back with float()
+    if math.isfinite(score):
+        return score
+    return "inf" if score > 0 else "-inf"
+
+class NDJSONWriter(RecordWriter):
+    """One JSON object per line."""
+    extension = ".ndjson"
+
+    def encode(self, record: dict) -> bytes:
+        if record["type"] == 'zset' and record["value"]:
+            record = {**record, "value": [[member, _json_score(score)] for member, score in record["value"]]}
+        if orjson is not None:
+            return orjson.dumps(record, default=_json_bytes, option=orjson.OPT_APPEND_NEWLINE)
+        return json.dumps(record, separators=(",", ":"), default=_json_bytes).encode() + b"\n"
+
+class MsgpackWriter(RecordWriter):
+    """msgpack maps, each preceded by its length as a 4-byte big-endian integer, so readers can skip records."""
+    extension = ".msgpack"
+
+    def __init__(self, path: str, compress: bool = False, chunk_size: int = 1000):
+        if msgpack is None:
+            raise RuntimeError("msgpack output needs the msgpack package")
+        super().__init__(path, compress, chunk_size)
+        self.packer = msgpack.Packer(use_bin_type=True)
+
+    def encode(self, record: dict) -> bytes:
+        packed = self.packer.pack(record)
+        return struct.pack('!I', len(packed)) + packed
+
+# Rough Python object cost per buffered element, so millions of tiny members still count against the budget
+ELEMENT_OVERHEAD = 64
+
+def value_size(key_type: str, value) -> int:
+    """Approximate in-memory bytes of a record value, counting 8 bytes per zset score."""
+    if value is None:
+        return 0
+    if key_type == 'string':
+        return len(value)
+    if key_type in ('list', 'set'):
+        return sum(len(element) + ELEMENT_OVERHEAD for element in value)
+    if key_type == 'hash':
+        return sum(len(field) + len(item) + 2 * ELEMENT_OVERHEAD for field, item in value)
+    return sum(len(member) + 8 + 2 * ELEMENT_OVERHEAD for member, _ in value)
+
+class ParquetWriter:
+    """Columnar row groups with a column per value shape, written every batch_bytes of buffered data.
+
+    Rows range from one short string to a whole chunk of a big collection, so the budget is in bytes, not rows.
+    """
+    extension = ".parquet"
+
+    def __init__(self, path: str, compress: bool = False, chunk_size: int = 1000, batch_bytes: int = PARQUET_BATCH_BYTES):
+        if pa is None:
+            raise RuntimeError("parquet output needs the pyarrow package")
+        if path == "-":
+            raise ValueError("parquet output needs a file path")
+        self.chunk_size = chunk_size
+        self.batch_bytes = batch_bytes
+        self.schema = pa.schema([
+            ("key", pa.binary()),
+            ("type", pa.string()),
+            ("part", pa.int32()),
+            # Exactly one of these is set per row, depending on the type
+            ("string", pa.binary()),
+            ("elements", pa.list_(pa.binary())),
+            ("fields", pa.list_(pa.struct([("field", pa.binary()), ("value", pa.binary())]))),
+            ("members", pa.list_(pa.struct([("member", pa.binary()), ("score", pa.float64())]))),
+            ("error", pa.string()),
+        ])
+        # Parquet compresses per column chunk itself, so zstd is the codec rather than a stream wrapper
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd" if compress else "snappy")
+        self._columns = {name: [] for name in self.schema.names}
+        self._rows = 0
+        self._bytes = 0
+
+    def write(self, key, key_type: str, value):
+        for record in records(key, key_type, value, self.chunk_size):
+            value = record["value"]
+            columns = self._columns
+            columns["key"].append(key)
+            columns["type"].append(key_type)
+            columns["part"].append(record["part"])
+            columns["error"].append(record["error"])
+            columns["string"].append(value if key_type == 'string' else None)
+            columns["elements"].append(value if key_type in ('list', 'set') else None)
+            columns["fields"].append([{"field": f, "value": v} for f, v in value] if key_type == 'hash' and value is not None else None)
+            columns["members"].append([{"member": m, "score": s} for m, s in value] if key_type == 'zset' and value is not None else None)
+
+            self._rows += 1
+            self._bytes += len(key) + value_size(key_type, value)
+            if self._bytes >= self.batch_bytes:
+                self.flush()
+
+    def flush(self):
+        if self._rows:
+            self.writer.write_batch(pa.RecordBatch.from_pydict(self._columns, schema=self.schema))
+            self._columns = {name: [] for name in self.schema.names}
+            self._rows = 0
+            self._bytes = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TextWriter(RecordWriter):
+    """The original human-readable dump, one line per key and one per element of a streamed collection."""
+
+    def encode(self, record: dict) -> bytes:
+        if record["part"] is None:
+            value = record["error"] if record["error"] is not None else record["value"]
+            return f"Key: {record['key']}, Type: {record['type']}, Value: {value}\n".encode()
+
+        # Chunks of a streamed collection list their elements under the header written with the first one
+        lines = [f"Key: {record['key']}, Type: {record['type']}, Value:"] if record["part"] == 0 else []
+        lines.extend(f"    {element}" for element in record["value"])
+        return ("\n".join(lines) + "\n").encode()
+
+WRITERS = {
+    "text": TextWriter,
+    "ndjson": NDJSONWriter,
+    "msgpack": MsgpackWriter,
+    "parquet": ParquetWriter,
+}
+
+def create_writer(kind: str, path: str, compress: bool = False, chunk_size: int = 1000):
+    if kind not in WRITERS:
+        raise ValueError(f"Unknown output format '{kind}', expected {', '.join(WRITERS)}")
+    return WRITERS[kind](path, compress, chunk_size)